@@ -4,6 +4,7 @@
 
 import sys
 import os
+import functools
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -24,7 +25,7 @@ try:
     from LIDAR_numpy import LIDAR_numpy_utile
     from donnees_echantillonnees_LIDAR import LIDAR_rectangle, LIDAR_carre_aleatoire
     from LIDAR_couches import LIDAR_couches_LEGO_LDRAW
-    from LIDAR_LDRAW import voxel_LDRAW, voxel_LDRAW_classif
+    from LIDAR_LDRAW import voxel_LDRAW, voxel_LDRAW_classif, definir_palette_LDRAW
     from LIDAR_traitement import (
         voxel_graphe, 
         corriger_voxels_non_classes_iteratif, 
@@ -34,14 +35,16 @@ try:
         ajouter_sol_coque,   
         ajouter_sol_rempli,  
         remplir_trous_verticaux, 
-        graphe_voxel
+        graphe_voxel,
+        table_voisins_6,
+        pipeline_structurel
     )
     import brique_merge
     import merge 
     from merge import Brick
     from cost_function import total_cost_function
-    from brique_merge import bricks_from_ldr, bricks_from_numpy
-    from solver import solve_greedy_stripe, export_to_ldr, print_brick_stats
+    from brique_merge import bricks_from_ldr, bricks_from_numpy_soa, runs_from_numpy
+    from solver import solve_greedy_stripe_runs, export_to_ldr, print_brick_stats
 
 except ImportError as e:
     print(f"\n[ERREUR] Impossible d'importer les modules : {e}")
@@ -172,12 +175,10 @@ CALCULER_COUT_STRUCTUREL = True
 # ===    CONFIGURATION DYNAMIQUE         ===
 # ==========================================
 
-def configurer_couleurs():
-    """Injecte la palette de couleur choisie dans le module brique_merge."""
-    if VISUALISATION == "GRIS":
-        return 
-
-    if MODE_COULEUR == "HEX":
+@functools.lru_cache(maxsize=None)
+def palette_couleurs(mode_couleur):
+    """Construit (une seule fois par mode) la palette classe LiDAR -> couleur LDraw."""
+    if mode_couleur == "HEX":
         MAP_HEX = {
             1: 0x2000000,   # Noir
             2: 0x28B4513,   # Marron 
@@ -191,27 +192,43 @@ def configurer_couleurs():
             66:0x2FFFFFF,   # Blanc
             67:0x2FFFF00,   # Jaune
         }
-        brique_merge.LIDAR_TO_LEGO_COLORS = MAP_HEX
+        return MAP_HEX
         
-    else:
-        MAP_STD = {
-            1: 0,   # Black
-            2: 6,   # Brown
-            3: 10,  # Bright Green
-            4: 2,   # Green
-            5: 288, # Dark Green
-            6: 7,   # Light Gray
-            9: 1,   # Blue
-            17: 4,  # Red
-            64: 14, # Yellow
-            66: 15, # White
-            67: 8,  # Dark Gray
-        }
-        brique_merge.LIDAR_TO_LEGO_COLORS = MAP_STD
+    MAP_STD = {
+        1: 0,   # Black
+        2: 6,   # Brown
+        3: 10,  # Bright Green
+        4: 2,   # Green
+        5: 288, # Dark Green
+        6: 7,   # Light Gray
+        9: 1,   # Blue
+        17: 4,  # Red
+        64: 14, # Yellow
+        66: 15, # White
+        67: 8,  # Dark Gray
+    }
+    return MAP_STD
+
+# Mode de couleur dont la palette est actuellement injectée (None : palette par défaut des modules)
+_MODE_COULEUR_CONFIGURE = None
+
+def configurer_couleurs():
+    """
+    Injecte la palette de couleur choisie dans les modules brique_merge et LIDAR_LDRAW.
+    Les tables ne sont reconstruites que si MODE_COULEUR a changé depuis la dernière injection.
+    """
+    global _MODE_COULEUR_CONFIGURE
+    if VISUALISATION == "GRIS" or _MODE_COULEUR_CONFIGURE == MODE_COULEUR:
+        return 
+
+    palette = palette_couleurs(MODE_COULEUR)
+    brique_merge.definir_palette_LEGO(palette)
+    definir_palette_LDRAW(palette)
+    _MODE_COULEUR_CONFIGURE = MODE_COULEUR
 
 def configurer_inventaire():
     """Injecte l'inventaire utilisateur dans le module merge."""
-    merge.VALID_SIZES = INVENTAIRE_BRIQUES
+    merge.set_valid_sizes(INVENTAIRE_BRIQUES)
 
 
 
@@ -220,11 +237,11 @@ def configurer_inventaire():
 # ==========================================
 
 def exporter_modele(counts, class_maj, chemin_sortie):
-    """Fonction utilitaire pour gérer le choix Couleur/Gris"""
+    """Fonction utilitaire pour gérer le choix Couleur/Gris (chemin_sortie : str déjà converti)"""
     if VISUALISATION == "COULEUR":
-        voxel_LDRAW_classif(counts, class_maj, nom_fichier=str(chemin_sortie))
+        voxel_LDRAW_classif(counts, class_maj, nom_fichier=chemin_sortie)
     else:
-        voxel_LDRAW(counts, nom_fichier=str(chemin_sortie))
+        voxel_LDRAW(counts, nom_fichier=chemin_sortie)
 
 
 
@@ -233,10 +250,31 @@ def exporter_modele(counts, class_maj, chemin_sortie):
 # ===       EXECUTION PRINCIPALE         ===
 # ==========================================
 
-if __name__ == "__main__":
+def pipeline(nom_fichier=NOM_FICHIER):
+    """
+    Exécute la chaîne complète (import, voxelisation, traitements, optimisation, export) sur un fichier .laz.
+
+    Les modules sont importés et configurés une seule fois par processus : plusieurs appels
+    successifs (ex : traitement de plusieurs dalles) ne repaient ni les imports ni la configuration.
+
+    Paramètres
+    ----------
+    nom_fichier : str
+        Nom du fichier .laz à traiter (doit être dans le dossier 'data').
+
+    Retour
+    ------
+    str ou None
+        Chemin du fichier .ldr final (None en mode "AFFICHAGE_INFO_LIDAR").
+
+    Exceptions
+    ----------
+    FileNotFoundError
+        Si le fichier est absent du dossier 'data' (un traitement par lots peut passer à la dalle suivante).
+    """
 
     # === A. Initialisation ===
-    fichier_entree = DATA_DIR / NOM_FICHIER
+    fichier_entree = DATA_DIR / nom_fichier
 
     # Configuration des modules dynamiques
     configurer_couleurs()
@@ -251,15 +289,15 @@ if __name__ == "__main__":
     else:
         dossiers["FINAL"] = OUTPUT_DIR / "Resultat_Final"
 
-    # Création des dossiers
+    # Création des dossiers (chemins convertis une seule fois en str)
+    dossiers = {cle: os.fspath(path) for cle, path in dossiers.items()}
     for path in dossiers.values():
         os.makedirs(path, exist_ok=True)
 
     if not fichier_entree.exists():
-        print(f"[ERREUR] Le fichier {NOM_FICHIER} est introuvable dans {DATA_DIR}")
-        sys.exit(1) 
+        raise FileNotFoundError(f"Le fichier {nom_fichier} est introuvable dans {DATA_DIR}")
 
-    print(f"\n=== DÉMARRAGE DU TRAITEMENT : {NOM_FICHIER} ===")
+    print(f"\n=== DÉMARRAGE DU TRAITEMENT : {nom_fichier} ===")
     print(f"   Mode d'import : {MODE_IMPORT}")
     if MODE_IMPORT != "AFFICHAGE_INFO_LIDAR":
         print(f"   Mode workflow : {MODE_WORKFLOW}")
@@ -286,7 +324,7 @@ if __name__ == "__main__":
         afficher_conversion(las)
         afficher_attributs_points(las)
         print("\nNombre total de points :", len(las.points))  
-        sys.exit(0)
+        return None
 
     elif MODE_IMPORT == "COMPLET":
         # Chargement complet
@@ -338,8 +376,8 @@ if __name__ == "__main__":
     # Export visuel AVANT traitement (seulement si étape par étape)
     if MODE_WORKFLOW == "ETAPE_PAR_ETAPE":
         print("   -> Exportation du modèle brut (Voxels)...")
-        nom_brut = f"01_BRUT_{NOM_FICHIER}_{suffixe}_{VISUALISATION}.ldr"
-        exporter_modele(counts, class_maj, dossiers["1"] / nom_brut)
+        nom_brut = f"01_BRUT_{nom_fichier}_{suffixe}_{VISUALISATION}.ldr"
+        exporter_modele(counts, class_maj, os.path.join(dossiers["1"], nom_brut))
 
 
 
@@ -350,56 +388,69 @@ if __name__ == "__main__":
     # === D. Traitements Structurels (Graphes) ===
     print("3. Analyse et Traitement Structurel...")
     
-    # 1. Création du graphe
-    G = voxel_graphe(counts, class_maj)
+    if MODE_WORKFLOW == "DIRECT":
+        # Chaîne fusionnée sur tableaux plats (pas d'export intermédiaire, donc pas de graphe)
+        counts_traite, class_maj_traite = pipeline_structurel(
+            counts, class_maj,
+            correction=PARAM_CORRECTION if ACTIVER_CORRECTION_NC else None,
+            filtre_classes=PARAM_FILTRE_CLASSES if ACTIVER_FILTRE_CLASSES else None,
+            filtre_sol=PARAM_FILTRE_SOL if ACTIVER_FILTRE_SOL else None,
+            consolidation=dict(PARAM_CONSOLIDATION, mode=TYPE_CONSOLIDATION) if TYPE_CONSOLIDATION != "AUCUN" else None,
+            remplissage=PARAM_REMPLISSAGE if ACTIVER_REMPLISSAGE_MURS else None
+        )
 
-    # 2. Correction voxels 
-    if ACTIVER_CORRECTION_NC:
-        print("   -> Correction des voxels non classés...")
-        G = corriger_voxels_non_classes_iteratif(G, **PARAM_CORRECTION)
+    else:
+        # 1. Création du graphe
+        voisins = table_voisins_6(counts)  # Réutilisée par la création du graphe et la correction
+        G = voxel_graphe(counts, class_maj, voisins=voisins)
+
+        # 2. Correction voxels 
+        if ACTIVER_CORRECTION_NC:
+            print("   -> Correction des voxels non classés...")
+            G = corriger_voxels_non_classes_iteratif(G, **PARAM_CORRECTION, voisins=voisins)
     
-    # 3. Filtrage
-    if ACTIVER_FILTRE_CLASSES:
-        print("   -> Filtrage des classes indésirables...")
-        G = graphe_filtre_classes(G, **PARAM_FILTRE_CLASSES)
+        # 3. Filtrage
+        if ACTIVER_FILTRE_CLASSES:
+            print("   -> Filtrage des classes indésirables...")
+            G = graphe_filtre_classes(G, **PARAM_FILTRE_CLASSES)
     
-    # 4. Supression bruit volant
-    if ACTIVER_FILTRE_SOL:
-        print("   -> Suppression du bruit volant (Filtrage Sol)...")
-        G = graphe_filtre_sol(G, **PARAM_FILTRE_SOL)
+        # 4. Supression bruit volant
+        if ACTIVER_FILTRE_SOL:
+            print("   -> Suppression du bruit volant (Filtrage Sol)...")
+            G = graphe_filtre_sol(G, **PARAM_FILTRE_SOL)
     
-    # 5. Consolidation du sol 
-    if TYPE_CONSOLIDATION != "AUCUN":
-        print(f"   -> Consolidation du sol (Mode: {TYPE_CONSOLIDATION})...")
+        # 5. Consolidation du sol 
+        if TYPE_CONSOLIDATION != "AUCUN":
+            print(f"   -> Consolidation du sol (Mode: {TYPE_CONSOLIDATION})...")
         
-        p_sol = PARAM_CONSOLIDATION["class_sol"]
-        p_bat = PARAM_CONSOLIDATION["class_bat"]
-        p_nmin = PARAM_CONSOLIDATION["n_min"]
-
-        if TYPE_CONSOLIDATION == "PILIERS":
-            step = PARAM_CONSOLIDATION.get("pillar_step")
-            pillar_width = PARAM_CONSOLIDATION.get("pillar_width")
-            G = ajouter_sol_coque_pillier(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin, pillar_step=step, pillar_width=pillar_width)
+            p_sol = PARAM_CONSOLIDATION["class_sol"]
+            p_bat = PARAM_CONSOLIDATION["class_bat"]
+            p_nmin = PARAM_CONSOLIDATION["n_min"]
+
+            if TYPE_CONSOLIDATION == "PILIERS":
+                step = PARAM_CONSOLIDATION.get("pillar_step")
+                pillar_width = PARAM_CONSOLIDATION.get("pillar_width")
+                G = ajouter_sol_coque_pillier(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin, pillar_step=step, pillar_width=pillar_width)
         
-        elif TYPE_CONSOLIDATION == "COQUE":
-            G = ajouter_sol_coque(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin)
+            elif TYPE_CONSOLIDATION == "COQUE":
+                G = ajouter_sol_coque(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin)
             
-        elif TYPE_CONSOLIDATION == "REMPLI":
-            G = ajouter_sol_rempli(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin)
+            elif TYPE_CONSOLIDATION == "REMPLI":
+                G = ajouter_sol_rempli(G, class_sol=p_sol, class_bat=p_bat, n_min=p_nmin)
 
-    # 6. Remplissage des murs 
-    if ACTIVER_REMPLISSAGE_MURS:
-        print("   -> Consolidation : Remplissage des murs...")
-        G = remplir_trous_verticaux(G, **PARAM_REMPLISSAGE)
+        # 6. Remplissage des murs 
+        if ACTIVER_REMPLISSAGE_MURS:
+            print("   -> Consolidation : Remplissage des murs...")
+            G = remplir_trous_verticaux(G, **PARAM_REMPLISSAGE)
 
-    # 7. Conversion inverse (Graphe -> Grille)
-    counts_traite, class_maj_traite = graphe_voxel(G)
+        # 7. Conversion inverse (Graphe -> Grille)
+        counts_traite, class_maj_traite = graphe_voxel(G)
 
     # Export visuel APRES traitement (seulement si étape par étape)
     if MODE_WORKFLOW == "ETAPE_PAR_ETAPE":
         print("   -> Exportation du modèle structuré (Voxels traités)...")
-        nom_struct = f"02_STRUCTURE_{NOM_FICHIER}_{suffixe}_{VISUALISATION}.ldr"
-        exporter_modele(counts_traite, class_maj_traite, dossiers["2"] / nom_struct)
+        nom_struct = f"02_STRUCTURE_{nom_fichier}_{suffixe}_{VISUALISATION}.ldr"
+        exporter_modele(counts_traite, class_maj_traite, os.path.join(dossiers["2"], nom_struct))
 
 
 
@@ -410,19 +461,21 @@ if __name__ == "__main__":
     # === E. Optimisation & Merging ===
     print("4. Optimisation & Merging...")
 
-    # 1. Conversion des voxels traités en objets Brick 
-    print("   -> Conversion : Voxels -> Briques unitaires...")
-    raw_bricks = bricks_from_numpy(counts_traite, class_maj_traite, visualisation=VISUALISATION)
-    print(f"      ({len(raw_bricks)} briques à optimiser)")
+    # 1. Conversion des voxels traités en runs de la passe 1 (lus sur la grille, sans briques unitaires)
+    print("   -> Conversion : Voxels -> Runs de briques unitaires...")
+    runs = runs_from_numpy(counts_traite, class_maj_traite, visualisation=VISUALISATION)
+    print(f"      ({int((counts_traite != 0).sum())} briques à optimiser)")
 
-    # Coût structurel avant l'algorithme
+    # Coût structurel avant l'algorithme (seul usage des briques unitaires, en colonnes NumPy)
     if CALCULER_COUT_STRUCTUREL:
+        raw_bricks = bricks_from_numpy_soa(counts_traite, class_maj_traite, visualisation=VISUALISATION)
         c_init = total_cost_function(raw_bricks)
         print(f"   -> Score de solidité initial : {c_init:.1f}")
 
     # 2. Exécution du Solver Glouton (Greedy Stripe)
     print("   -> Exécution de l'algorithme d'assemblage...")
-    final_bricks = solve_greedy_stripe(raw_bricks)
+    # Résultat gardé en colonnes NumPy : coût, inventaire et export les lisent sans objets Brick
+    final_bricks = solve_greedy_stripe_runs(runs, as_array=True)
 
     # Coût structurel après l'algorithme
     if CALCULER_COUT_STRUCTUREL:
@@ -436,15 +489,15 @@ if __name__ == "__main__":
     print_brick_stats(final_bricks)
 
     # 4. Export Final
-    nom_final = f"03_FINAL_{NOM_FICHIER}_{suffixe}_{VISUALISATION}.ldr"
+    nom_final = f"03_FINAL_{nom_fichier}_{suffixe}_{VISUALISATION}.ldr"
     
     if MODE_WORKFLOW == "ETAPE_PAR_ETAPE":
-        chemin_final = dossiers["3"] / nom_final
+        chemin_final = os.path.join(dossiers["3"], nom_final)
     else:
-        chemin_final = dossiers["FINAL"] / nom_final
+        chemin_final = os.path.join(dossiers["FINAL"], nom_final)
 
     print(f"   -> Génération du fichier : {chemin_final}")
-    export_to_ldr(final_bricks, str(chemin_final))
+    export_to_ldr(final_bricks, chemin_final)
 
 
 
@@ -458,4 +511,14 @@ if __name__ == "__main__":
         print(f"2. Structure    : {dossiers['2']}")
         print(f"3. Final Lego   : {dossiers['3']}")
     else:
-        print(f"Résultat final  : {dossiers['FINAL']}")
\ No newline at end of file
+        print(f"Résultat final  : {dossiers['FINAL']}")
+
+    return chemin_final
+
+
+if __name__ == "__main__":
+    try:
+        pipeline(NOM_FICHIER)
+    except FileNotFoundError as e:
+        print(f"[ERREUR] {e}")
+        sys.exit(1)
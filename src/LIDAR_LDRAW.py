@@ -34,6 +34,168 @@ from LIDAR_couches import LIDAR_couches, LIDAR_couches_LEGO, LIDAR_couches_LEGO_
 
 
 
+# === Format des lignes LDraw ===
+
+# Toutes les briques 1x1 partagent la même matrice de rotation et la même pièce : seuls la couleur et la position changent.
+HEADER_LDRAW = b"0 Generated from LiDAR voxel model\n0 Author: Python Script\n"
+LIGNE_BRIQUE = b"1 %d %d %d %d 1 0 0 0 1 0 0 0 1 3005.dat\n"
+
+# Écriture par blocs : nombre de briques formatées à la fois et taille du tampon d'écriture (octets).
+# Le remplissage '%' d'un bloc entier s'exécute déjà en C : un encodage ASCII vectorisé NumPy
+# (chiffres par divisions successives, puis compactage) mesure le même temps par bloc, et un mmap
+# préalloué n'apporte rien face à l'écriture tamponnée. Le goulot n'est plus le formatage.
+TAILLE_BLOC = 65536
+TAILLE_TAMPON = 1 << 20
+
+
+def formater_lignes_LDRAW(couleurs, x, y, z):
+    """
+    Formate en un seul bloc de bytes les lignes LDraw d'une série de briques 1x1.
+
+    Le gabarit de ligne est répété N fois puis rempli en une seule opération '%',
+    ce qui évite une f-string Python par voxel.
+
+    Paramètres
+    ----------
+    couleurs, x, y, z : np.ndarray
+        Tableaux 1D d'entiers de même longueur (couleur LDraw et coordonnées LDraw).
+
+    Retour
+    ------
+    bytes
+        Contenu des lignes, prêt à être écrit dans le fichier .ldr.
+    """
+
+    valeurs = np.column_stack((couleurs, x, z, y)).ravel().tolist()
+    return (LIGNE_BRIQUE * len(x)) % tuple(valeurs)
+
+
+
+def extraire_voxels_LDRAW(counts, class_maj=None):
+    """
+    Extrait en un seul parcours de la grille les voxels pleins et leurs coordonnées LDraw.
+
+    Paramètres
+    ----------
+    counts : np.ndarray
+        Tableau 3D (y, x, z) indiquant le nombre de points dans chaque voxel.
+    class_maj : np.ndarray, optional
+        Tableau 3D des classes majoritaires, lu uniquement aux voxels pleins.
+
+    Retour
+    ------
+    x, y, z : np.ndarray (int32)
+        Coordonnées LDraw des briques (20 LDU en XY, 24 LDU en hauteur).
+    voxel_class : np.ndarray ou None
+        Classe majoritaire de chaque voxel plein (None si class_maj n'est pas fourni).
+    """
+
+    voxel_plein = np.flatnonzero(counts)
+    iy, ix, iz = np.unravel_index(voxel_plein, counts.shape)
+
+    x = ix.astype(np.int32) * 20
+    y = iy.astype(np.int32) * 20
+    z = iz.astype(np.int32) * -24
+
+    voxel_class = class_maj.ravel()[voxel_plein] if class_maj is not None else None
+    return x, y, z, voxel_class
+
+
+
+def ecrire_fichier_LDRAW_vide(nom_fichier):
+    """Écrit un fichier LDraw sans brique (en-tête seul), pour une grille vide."""
+
+    with open(nom_fichier, "wb") as f:
+        f.write(HEADER_LDRAW)
+
+
+
+def ecrire_fichier_LDRAW(nom_fichier, couleurs, x, y, z):
+    """
+    Écrit un fichier LDraw de briques 1x1 par blocs de TAILLE_BLOC briques.
+
+    Seul un bloc de lignes formatées existe en mémoire à un instant donné,
+    la mémoire utilisée ne dépend donc pas du nombre total de briques.
+    """
+
+    with open(nom_fichier, "wb", buffering=TAILLE_TAMPON) as f:
+        f.write(HEADER_LDRAW)
+        for debut in range(0, len(x), TAILLE_BLOC):
+            bloc = slice(debut, debut + TAILLE_BLOC)
+            f.write(formater_lignes_LDRAW(couleurs[bloc], x[bloc], y[bloc], z[bloc]))
+
+
+
+# === Correspondance classification LIDAR -> couleur LDraw ===
+
+# # === Dictionnaire classification LIDAR en couleur LDraw hexadécimal ===
+# # Décommenter si besoin de correspondance visuelle stricte.
+# LDRAW_COULEURS = {
+#     1: 0x2000000,   # Non classé => noir
+#     2: 0x28B4513,   # Sol => marron
+#     3: 0x290EE90,   # Végétation basse  => vert clair
+#     4: 0x2008000,   # Végétation moyenne => vert
+#     5: 0x200561B,   # Végétation haute => vert foncé
+#     6: 0x2555555,   # Bâtiment => gris
+#     9: 0x20000FF,   # Eau => bleu
+#     17:0x2FF0000,   # Tablier de pont => rouge 
+#     64:0x2FFA500,   # Sursol => orange
+#     66:0x2FFFFFF,   # Points virtuels => blanc
+#     67:0x2FFFF00,   # Divers bâtis => jaune
+# }
+
+# === Dictionnaire classification LIDAR en couleur LDraw classique ===
+LDRAW_COULEURS = {
+    1: 0,   # Non classé → Noir
+    2: 6,   # Sol → Brun
+    3: 10,  # Végétation basse → Vert vif
+    4: 2,   # Végétation moyenne → Vert
+    5: 288, # Végétation haute → Vert sapin 
+    6: 7,   # Bâtiment → Gris clair 
+    9: 1,   # Eau → Bleu
+    17: 4,  # Pont → Rouge
+    64: 14, # Sursol → Jaune
+    66: 15, # Virtuels → Blanc
+    67: 8,  # Divers bâtis → Gris foncé 
+}
+
+COULEUR_DEFAUT = 24
+
+
+def construire_lut_couleurs(palette, taille=256):
+    """
+    Construit la table de correspondance dense (classe -> couleur LDraw).
+
+    int32 car les couleurs hexadécimales (0x2RRGGBB) dépassent int16.
+    Les classes absentes de la palette reçoivent COULEUR_DEFAUT.
+    """
+
+    lut = np.full(max(taille, max(palette) + 1), COULEUR_DEFAUT, dtype=np.int32)
+    for classe, couleur in palette.items():
+        lut[classe] = couleur
+    return lut
+
+
+# Table active, construite une seule fois (remplaçable via definir_palette_LDRAW)
+_LUT_ACTIVE = construire_lut_couleurs(LDRAW_COULEURS)
+
+
+def definir_palette_LDRAW(palette):
+    """Remplace la palette utilisée par voxel_LDRAW_classif (ex : palette HEX de main.py)."""
+    global _LUT_ACTIVE
+    _LUT_ACTIVE = construire_lut_couleurs(palette)
+
+
+def lut_couleurs_LDRAW(voxel_class):
+    """Retourne la table active, agrandie seulement si une classe dépasse sa taille."""
+    if len(voxel_class) and int(voxel_class.max()) >= len(_LUT_ACTIVE):
+        lut = np.full(int(voxel_class.max()) + 1, COULEUR_DEFAUT, dtype=np.int32)
+        lut[:len(_LUT_ACTIVE)] = _LUT_ACTIVE
+        return lut
+    return _LUT_ACTIVE
+
+
+
 # === Fonctions principales ===
 
 def voxel_LDRAW(counts, nom_fichier="modele_LEGO.ldr"): 
@@ -47,40 +209,29 @@ def voxel_LDRAW(counts, nom_fichier="modele_LEGO.ldr"):
     ----------
     counts : np.ndarray
         Tableau 3D indiquant le nombre de points dans chaque voxel.
-    densite_min : int
-        Nombre minimum de points pour qu’un voxel soit considéré “plein”.
     nom_fichier : str, optional
         Nom du fichier LDraw à générer (par défaut "modele_LEGO.ldr").
 
     Retour
     ------
     int
-        Nombre total de briques générées.
+        Nombre total de briques générées (aucune liste de lignes n'est conservée).
     """
 
-    # === Récupération des voxels pleins et des indices ===
-    voxel_plein = np.argwhere(counts > 0)
-    iy, ix, iz = voxel_plein[:,0], voxel_plein[:,1], voxel_plein[:,2] 
-    
-    # === Conversion en coordonnées LDraw ===
-    x = ix * 20 
-    y = iy * 20 
-    z = -iz * 24 
-    
-    # === Génération des lignes pour les briques ===
-    lignes = [
-        f"1 16 {xi} {zi} {yi} 1 0 0 0 1 0 0 0 1 3005.dat\n"
-        for xi, yi, zi in zip(x, y, z)
-    ]
+    # === Grille vide : en-tête seul ===
+    if not counts.any():
+        ecrire_fichier_LDRAW_vide(nom_fichier)
+        print(f"{nom_fichier} (Total: 0 briques) ")
+        return 0
+
+    # === Récupération des voxels pleins en coordonnées LDraw ===
+    x, y, z, _ = extraire_voxels_LDRAW(counts)
     
     # === Génération du fichier ===
-    header = ["0 Generated from LiDAR voxel model\n", "0 Author: Python Script\n"] 
-    with open(nom_fichier, "w") as f: 
-        f.writelines(header) 
-        f.writelines(lignes) 
+    ecrire_fichier_LDRAW(nom_fichier, np.full(len(x), 16), x, y, z)
         
-    print(f"{nom_fichier} (Total: {len(voxel_plein)} briques) ") 
-    return lignes
+    print(f"{nom_fichier} (Total: {len(x)} briques) ") 
+    return len(x)
 
 
 
@@ -98,79 +249,32 @@ def voxel_LDRAW_classif(counts, class_maj, nom_fichier="modele_LEGO_classif.ldr"
         Tableau 3D indiquant le nombre de points dans chaque voxel.
     class_maj : np.ndarray
         Tableau 3D de mêmes dimensions que counts indiquant la classification majoritaire de chaque voxel.
-    densite_min : int
-        Nombre minimum de points pour qu’un voxel soit considéré “plein”.
     nom_fichier : str, optional
         Nom du fichier LDraw à générer (par défaut "modele_LEGO_classif.ldr").
 
     Retour
     ------
     int
-        Nombre total de briques générées.
+        Nombre total de briques générées (aucune liste de lignes n'est conservée).
     """
 
-    # === Récupération des voxels pleins et des classifications ===
-    voxel_plein = np.argwhere(counts > 0)
-    iy, ix, iz = voxel_plein[:,0], voxel_plein[:,1], voxel_plein[:,2]
-    voxel_class = class_maj[iy, ix, iz]
-
-    # === Conversion en coordonnées LDraw ===
-    x = ix * 20
-    y = iy * 20
-    z = -iz * 24  
-
-    # # === Dictionnaire classification LIDAR en couleur LDraw hexadécimal ===
-    # # Décommenter si besoin de correspondance visuelle stricte.
-    # ldraw_couleurs = {
-    #     1: 0x2000000,   # Non classé => noir
-    #     2: 0x28B4513,   # Sol => marron
-    #     3: 0x290EE90,   # Végétation basse  => vert clair
-    #     4: 0x2008000,   # Végétation moyenne => vert
-    #     5: 0x200561B,   # Végétation haute => vert foncé
-    #     6: 0x2555555,   # Bâtiment => gris
-    #     9: 0x20000FF,   # Eau => bleu
-    #     17:0x2FF0000,   # Tablier de pont => rouge 
-    #     64:0x2FFA500,   # Sursol => orange
-    #     66:0x2FFFFFF,   # Points virtuels => blanc
-    #     67:0x2FFFF00,   # Divers bâtis => jaune
-    # }
-
-    # === Dictionnaire classification LIDAR en couleur LDraw classique ===
-    ldraw_couleurs = {
-        1: 0,   # Non classé → Noir
-        2: 6,   # Sol → Brun
-        3: 10,  # Végétation basse → Vert vif
-        4: 2,   # Végétation moyenne → Vert
-        5: 288, # Végétation haute → Vert sapin 
-        6: 7,   # Bâtiment → Gris clair 
-        9: 1,   # Eau → Bleu
-        17: 4,  # Pont → Rouge
-        64: 14, # Sursol → Jaune
-        66: 15, # Virtuels → Blanc
-        67: 8,  # Divers bâtis → Gris foncé 
-    }
-
-    couleurs = np.array([ldraw_couleurs.get(c, 24) for c in voxel_class], dtype=int)
-
-    # === Génération du header ===
-    header = [
-        "0 Generated from LiDAR voxel model\n",
-        "0 Author: Python Script\n",
-    ]
-
-    # === Génération des lignes pour les briques ===
-    lignes = [
-        f"1 {c} {xi} {zi} {yi} 1 0 0 0 1 0 0 0 1 3005.dat\n"
-        for c, xi, yi, zi in zip(couleurs, x, y, z)
-    ]
+    # === Grille vide : en-tête seul, sans table de couleurs ni tableaux vides ===
+    if not counts.any():
+        ecrire_fichier_LDRAW_vide(nom_fichier)
+        print(f"{nom_fichier} (Total: 0 briques)")
+        return 0
+
+    # === Récupération des voxels pleins (coordonnées LDraw) et de leurs classifications ===
+    x, y, z, voxel_class = extraire_voxels_LDRAW(counts, class_maj)
+
+    # === Couleur LDraw de chaque voxel via la table de correspondance active ===
+    couleurs = lut_couleurs_LDRAW(voxel_class)[voxel_class]
 
     # === Génération du fichier ===
-    with open(nom_fichier, "w") as f:
-        f.writelines(header)
-        f.writelines(lignes)
+    ecrire_fichier_LDRAW(nom_fichier, couleurs, x, y, z)
 
-    print(f"{nom_fichier} (Total: {len(voxel_plein)} briques)")
-    return lignes
+    print(f"{nom_fichier} (Total: {len(x)} briques)")
+    return len(x)
 
 
 
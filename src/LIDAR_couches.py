@@ -20,6 +20,8 @@ import sys
 import os
 import numpy as np
 import rasterio
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from rasterio.transform import from_origin
 from pathlib import Path
 
@@ -34,86 +36,353 @@ sys.path.append(str(SRC_DIR))
 # --- Imports des modules du projet ---
 from donnees_echantillonnees_LIDAR import LIDAR_carre_aleatoire, LIDAR_rectangle  
 from import_LIDAR import laz_to_las
-from LIDAR_numpy import LIDAR_numpy_utile
+from LIDAR_numpy import LIDAR_numpy_utile, min_max
 
 
 
 
 # === Fonctions principales ===
 
-def LIDAR_couches(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite_min=1):
+# Nombre de points indexés à la fois : les temporaires d'un bloc restent en cache
+TAILLE_BLOC_POINTS = 1 << 16
+
+
+def indices_voxels(x, y, z, origine, pas, dims, taille_bloc=TAILLE_BLOC_POINTS):
     """
-    Crée un modèle voxelisé 'couche par couche' à partir d'un tableau Numpy d'un nuage de points LiDAR.
+    Calcule l'indice linéaire (y, x, z) du voxel de chaque point, en une seule passe par blocs.
+
+    Pour chaque bloc, floor, bornage et linéarisation s'enchaînent sur des tampons réutilisés,
+    au lieu de plusieurs passes pleine longueur (ix, iy, iz, masque, ravel_multi_index).
+
+    La grille part du minimum des coordonnées : les indices sont positifs par construction et seul
+    le bord supérieur (point au maximum exact d'un axe) peut déborder. Ces points sont ramenés
+    dans le dernier voxel au lieu d'être écartés, d'où aucun masque de validité.
+
+    Coordonnées entières (int32 brutes d'un fichier LAS) et pas entiers : tout se fait en
+    arithmétique entière (soustraction, division euclidienne), sans passer par des flottants.
 
     Paramètres
     ----------
-    lidar_numpy : np.ndarray
-        Tableau numpy structuré contenant au moins x, y, z.
-    taille_xy : float
-        Taille horizontale d’un voxel, résolution (en mètres).
-    hauteur_couche : float
-        Épaisseur verticale d’un layer (en mètres).
-    densite_min : int
-        Nombre minimum de points pour qu’un voxel soit considéré “plein”.
+    x, y, z : np.ndarray
+        Coordonnées des points.
+    origine : tuple
+        (x_min, y_min, z_min) de la grille.
+    pas : tuple
+        Taille des voxels selon x, y, z (dans l'unité des coordonnées).
+    dims : tuple
+        (nx, ny, nz) nombre de voxels selon chaque axe (au moins 1).
+    taille_bloc : int
+        Nombre de points traités à la fois.
 
     Retour
     ------
-    counts : np.ndarray
-        Nombre de points par voxel (densité)
-    class_maj : np.ndarray
-        Classification majoritaire de chaque voxel
+    voxel_index : np.ndarray (int64)
+        Indice linéaire dans la grille (ny, nx, nz) de chaque point.
     """
 
-    # === Étendue de la zone ===
-    x, y, z = lidar_numpy["x"], lidar_numpy["y"], lidar_numpy["z"]
-    classification = lidar_numpy["classification"]
-    
-    x_min, x_max = x.min(), x.max()
-    y_min, y_max = y.min(), y.max()
-    z_min, z_max = z.min(), z.max()
+    nx, ny, nz = dims
+    n = len(x)
+    voxel_index = np.zeros(n, dtype=np.int64)
+    entier = all(np.issubdtype(c.dtype, np.integer) for c in (x, y, z)) and all(isinstance(p, int) for p in pas)
+
+    # Tampons d'un bloc, alloués une seule fois et réutilisés pour les trois axes et tous les blocs
+    f = np.empty(0 if entier else min(n, taille_bloc), dtype=np.float64)
+    i_bloc = np.empty(min(n, taille_bloc), dtype=np.int64)
+
+    for debut in range(0, n, taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        lin = voxel_index[bloc]
+        fb, i = f[:len(lin)], i_bloc[:len(lin)]
+
+        for coord, c_min, taille, nc in ((y, origine[1], pas[1], ny), (x, origine[0], pas[0], nx), (z, origine[2], pas[2], nz)):
+            if entier:
+                # i = (coord - c_min) // taille, exact
+                np.subtract(coord[bloc], int(c_min), out=i, dtype=np.int64)
+                np.floor_divide(i, taille, out=i)
+                np.clip(i, 0, nc - 1, out=i)
+                lin *= nc
+                lin += i
+                continue
+
+            np.subtract(coord[bloc], c_min, out=fb, dtype=np.float64)
+            np.divide(fb, taille, out=fb)
+            np.floor(fb, out=fb)
+            np.clip(fb, 0, nc - 1, out=fb)
+            # lin = lin * nc + floor(...)
+            np.copyto(i, fb, casting="unsafe")
+            lin *= nc
+            lin += i
+
+    return voxel_index
+
+
+# Codes de classification LAS sur un octet : la clé (voxel, classe) vaut voxel * NB_CLASSES + classe
+NB_CLASSES = 256
+
+# Nombre de points voxelisés à la fois : seuls les résultats partiels (paires présentes) s'accumulent
+TAILLE_BLOC_VOXELISATION = 2_000_000
+
+
+def paires_voxels_classes(voxel_index, classification):
+    """
+    Regroupe les points d'un bloc par paire (voxel, classe).
+
+    Retour
+    ------
+    cles : np.ndarray (int64)
+        Clés voxel * NB_CLASSES + classe présentes, triées (donc par voxel puis par classe).
+    nb : np.ndarray (int64)
+        Nombre de points de chaque paire.
+    """
+
+    cle = voxel_index.astype(np.int64) * NB_CLASSES + classification
+    return np.unique(cle, return_counts=True)
+
+
+
+def fusionner_paires(partiels):
+    """
+    Fusionne les paires (cles, nb) de plusieurs blocs en sommant les comptes des clés communes.
+    """
+
+    if len(partiels) == 1:
+        return partiels[0]
+
+    cles = np.concatenate([c for c, _ in partiels])
+    nb = np.concatenate([n for _, n in partiels])
+    ordre = np.argsort(cles, kind="stable")
+    cles, nb = cles[ordre], nb[ordre]
+
+    debuts = np.flatnonzero(np.r_[True, cles[1:] != cles[:-1]])
+    return cles[debuts], np.add.reduceat(nb, debuts)
+
+
+
+def compter_voxels_classes(cles, nb, n_voxels, classe_vide=0):
+    """
+    Compte les points et détermine la classe majoritaire de chaque voxel, sans tableau dense (voxel, classe).
+
+    Travaille sur les paires (voxel, classe) présentes : la mémoire dépend du nombre de paires
+    et non de n_voxels x nombre de classes (grille souvent très creuse).
+
+    Règle : la classe 1 (Non classé) est ignorée dans un voxel où une autre classe est présente.
+    En cas d'égalité, la plus petite classe l'emporte (comme np.argmax sur les classes triées).
+
+    Paramètres
+    ----------
+    cles, nb : np.ndarray
+        Paires triées et leurs effectifs (voir paires_voxels_classes / fusionner_paires).
+    n_voxels : int
+        Nombre total de voxels de la grille.
+    classe_vide : int
+        Classe attribuée aux voxels vides (plus petite classe présente, comme avant).
+
+    Retour
+    ------
+    counts : np.ndarray (uint32)
+        Nombre de points par voxel (1D, taille n_voxels).
+    class_maj : np.ndarray (uint8)
+        Classe majoritaire par voxel (1D).
+    """
+
+    # Seule grille dense de comptage : uint32 suffit (nombre de points d'une dalle < 2**32)
+    counts = np.zeros(n_voxels, dtype=np.uint32)
+    class_maj = np.full(n_voxels, classe_vide, dtype=np.uint8)
+    if len(cles) == 0:
+        return counts, class_maj
+
+    # === Paires (voxel, classe) présentes, triées par voxel puis par classe ===
+    vox, cls = cles // NB_CLASSES, cles % NB_CLASSES
+
+    debuts = np.flatnonzero(np.r_[True, vox[1:] != vox[:-1]])
+    vox_occupes = vox[debuts]
+    totaux = np.add.reduceat(nb, debuts)
+    counts[vox_occupes] = totaux
+    nb_classes_voxel = np.diff(np.r_[debuts, len(vox)])
+
+    # === Ignorer "Non classé" (1) dans les voxels contenant une autre classe ===
+    # Une autre classe est présente si le total du voxel dépasse l'effectif de la classe 1 :
+    # seules les paires de classe 1 sont visitées, sans masque sur toutes les paires.
+    non_classes = np.flatnonzero(cls == 1)
+    segment = np.searchsorted(debuts, non_classes, side="right") - 1
+    nb = nb.copy()
+    nb[non_classes[totaux[segment] > nb[non_classes]]] = 0
+
+    # === Classe majoritaire : premier maximum de chaque voxel (segments contigus, sans tri) ===
+    maximum = np.repeat(np.maximum.reduceat(nb, debuts), nb_classes_voxel)
+    candidats = np.flatnonzero(nb == maximum)
+    premiers = candidats[np.r_[True, vox[candidats[1:]] != vox[candidats[:-1]]]]
+    class_maj[vox_occupes] = cls[premiers]
+
+    return counts, class_maj
+
+
+
+def voxeliser_par_blocs(x, y, z, classification, origine, pas, dims, taille_bloc=TAILLE_BLOC_VOXELISATION):
+    """
+    Voxelise le nuage par blocs de points : indexation puis regroupement (voxel, classe) par bloc.
+
+    Aucun tableau de la longueur du nuage n'est créé : la mémoire de travail dépend de la taille
+    d'un bloc et du nombre de paires (voxel, classe) présentes, qui reste petit devant le nuage.
+
+    Paramètres
+    ----------
+    x, y, z, classification : np.ndarray
+        Attributs des points.
+    origine, pas, dims : tuple
+        Géométrie de la grille (voir indices_voxels).
+    taille_bloc : int
+        Nombre de points traités à la fois.
+
+    Retour
+    ------
+    counts, class_maj : np.ndarray
+        Grilles aplaties (voir compter_voxels_classes).
+    """
+
+    nx, ny, nz = dims
+    partiels = [
+        paires_voxels_classes(
+            indices_voxels(x[debut:debut + taille_bloc], y[debut:debut + taille_bloc], z[debut:debut + taille_bloc], origine, pas, dims),
+            classification[debut:debut + taille_bloc],
+        )
+        for debut in range(0, len(x), taille_bloc)
+    ]
+    if not partiels:
+        return compter_voxels_classes(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), ny*nx*nz)
 
-    nx = int(np.ceil((x_max - x_min) / taille_xy))
-    ny = int(np.ceil((y_max - y_min) / taille_xy))
-    nz = int(np.ceil((z_max - z_min) / hauteur_couche))
+    cles, nb = fusionner_paires(partiels)
+    return compter_voxels_classes(cles, nb, ny*nx*nz, classe_vide=classification.min())
 
-    print(f"Dimensions voxel grille : {nx} x {ny} x {nz} (XY:{taille_xy}m, Z:{hauteur_couche:.2f}m)")
 
-    # === Indexation vectorisée ===
-    ix = np.floor((x - x_min) / taille_xy).astype(int)
-    iy = np.floor((y - y_min) / taille_xy).astype(int)
-    iz = np.floor((z - z_min) / hauteur_couche).astype(int)
 
-    valid = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny) & (iz >= 0) & (iz < nz)
-    ix, iy, iz, classification = ix[valid], iy[valid], iz[valid], classification[valid]
+# Nombre de GeoTIFF écrits simultanément par LIDAR_couches_export
+NB_ECRITURES_TIFF = min(8, os.cpu_count() or 1)
 
-    # === Comptage des voxels ===
-    counts, _ = np.histogramdd(sample=np.vstack([iy, ix, iz]).T, bins=(ny, nx, nz)) # utilisation de la vectorisation au lieu d'une boucle for qui serait trop gourmande
-    counts = counts.astype(int)
+# Couches GeoTIFF en une seule bande indexée (palette) : valeur du pixel -> couleur RGBA
+PIXEL_PLEIN, PIXEL_SOCLE, PIXEL_VIDE = 0, 1, 255
+PALETTE_COUCHES = {
+    PIXEL_PLEIN: (0, 0, 0, 255),        # noir = voxel plein
+    PIXEL_SOCLE: (139, 69, 19, 255),    # marron = socle
+    PIXEL_VIDE: (255, 255, 255, 255),   # blanc = voxel vide
+}
 
-    # === Classe majoritaire vectorisée ===
-    classes_uniques, class_indices = np.unique(classification, return_inverse=True)
-    nbr_classes = len(classes_uniques)
-    voxel_index = np.ravel_multi_index((iy, ix, iz), dims=(ny, nx, nz))
 
-    class_counts = np.zeros((ny*nx*nz, nbr_classes), dtype=np.int32)
-    for c in range(nbr_classes):
-        mask = class_indices == c
-        np.add.at(class_counts[:, c], voxel_index[mask], 1)
+def ecrire_couche_tiff(save_path, img, transform):
+    """
+    Écrit une couche (ny, nx) de pixels indexés en GeoTIFF à palette (une seule bande uint8).
+
+    img doit déjà être orientée nord en haut (première ligne = y_max), comme la transform.
+    """
+
+    ny, nx = img.shape
+    with rasterio.open(
+        save_path,
+        'w',
+        driver='GTiff',
+        height=ny,
+        width=nx,
+        count=1,
+        dtype='uint8',
+        crs='EPSG:2154',
+        transform=transform,
+        photometric='palette'
+    ) as dst:
+        dst.write(img, 1)
+        dst.write_colormap(1, PALETTE_COUCHES)
+
+
+
+def pas_en_unites(taille, echelle):
+    """
+    Taille d'un voxel exprimée dans l'unité des coordonnées (taille / echelle).
+
+    Ramenée à un entier quand elle en est à l'arrondi près (1.2 / 0.01 = 119.99999999999999 -> 120) :
+    avec des coordonnées entières, la voxelisation reste alors exacte.
+    """
+
+    pas = taille / echelle
+    if echelle != 1.0 and abs(pas - round(pas)) <= 1e-6 * pas:
+        return int(round(pas))
+    return pas
+
+
+
+@dataclass(slots=True)
+class GridSpec:
+    """
+    Descripteur de la grille de voxels d'un nuage : origine, dimensions, pas et emprise réelle.
+
+    Les bornes du nuage (min/max de x, y, z, une passe complète sur les points chacune) sont
+    mémorisées par NuagePoints : construire plusieurs grilles sur le même nuage (autre hauteur
+    de couche, wrappers LEGO/LDRAW) ne les recalcule pas.
+    """
+
+    x_min: float            # Origine de la grille, dans l'unité des coordonnées du nuage
+    y_min: float
+    z_min: float
+    nx: int
+    ny: int
+    nz: int
+    taille_xy: float        # En mètres
+    hauteur_couche: float   # En mètres
+    pas: tuple              # Taille des voxels selon x, y, z, dans l'unité des coordonnées
+    emprise: tuple          # (x_min, y_max, z_min) en coordonnées réelles, pour le géoréférencement
+
+    @classmethod
+    def from_lidar(cls, lidar_numpy, taille_xy, hauteur_couche):
+        """Construit la grille d'un nuage (NuagePoints ou tableau structuré) pour une résolution donnée."""
+
+        if hasattr(lidar_numpy, "bornes"):
+            (x_min, x_max), (y_min, y_max), (z_min, z_max) = lidar_numpy.bornes()
+        else:
+            (x_min, x_max), (y_min, y_max), (z_min, z_max) = (min_max(lidar_numpy[c]) for c in ("x", "y", "z"))
+
+        # Coordonnées entières brutes (NuagePoints lu d'un LAS) : coordonnée réelle = origine + x * échelle
+        ex, ey, ez = getattr(lidar_numpy, "echelle", None) or (1.0, 1.0, 1.0)
+        ox, oy, oz = getattr(lidar_numpy, "origine", None) or (0.0, 0.0, 0.0)
+
+        return cls(
+            x_min, y_min, z_min,
+            nx=max(1, int(np.ceil((x_max - x_min) * ex / taille_xy))),
+            ny=max(1, int(np.ceil((y_max - y_min) * ey / taille_xy))),
+            nz=max(1, int(np.ceil((z_max - z_min) * ez / hauteur_couche))),
+            taille_xy=taille_xy,
+            hauteur_couche=hauteur_couche,
+            pas=tuple(pas_en_unites(taille, e) for taille, e in ((taille_xy, ex), (taille_xy, ey), (hauteur_couche, ez))),
+            emprise=(ox + x_min * ex, oy + y_max * ey, oz + z_min * ez),
+        )
 
-    class_counts = class_counts.reshape(ny, nx, nz, nbr_classes)
+    @property
+    def transform(self):
+        """Transform géoréférencée des couches (affecte coordonnées réelles aux pixels)."""
+        return from_origin(self.emprise[0], self.emprise[1], self.taille_xy, self.taille_xy)
 
-    # === Trouver l'indice correspondant à la classe 1 (Non classé) => Règle : ignorer "Non classé" (1) s'il y a une autre classe présente ===
-    idx_non_classe = np.where(classes_uniques == 1)[0]
-    if len(idx_non_classe) > 0:
-        idx_non_classe = idx_non_classe[0]
-        # Masque : voxels contenant au moins une autre classe
-        mask_autre = (np.sum(class_counts > 0, axis=-1) > 1) & (class_counts[..., idx_non_classe] > 0)
-        # On met à zéro la classe 1 dans ces voxels
-        class_counts[mask_autre, idx_non_classe] = 0
 
-    # === Classe majoritaire finale ===
-    idx_max = np.argmax(class_counts, axis=-1)
-    class_maj = classes_uniques[idx_max]
+
+def _voxeliser(lidar_numpy, grille, densite_min):
+    """
+    Cœur commun de LIDAR_couches et LIDAR_couches_export : comptage, classe majoritaire, seuil.
+
+    Retour
+    ------
+    counts : np.ndarray (uint32)
+        Nombre de points par voxel (y, x, z), voxels sous densite_min mis à 0.
+    class_maj : np.ndarray (uint8)
+        Classification majoritaire de chaque voxel (0 pour les voxels sous le seuil).
+    """
+
+    nx, ny, nz = grille.nx, grille.ny, grille.nz
+    print(f"Dimensions voxel grille : {nx} x {ny} x {nz} (XY:{grille.taille_xy}m, Z:{grille.hauteur_couche:.2f}m)")
+
+    # === Voxelisation par blocs : comptage et classe majoritaire sur les seuls voxels occupés ===
+    # (points du bord supérieur ramenés dans la grille, pas besoin d'histogramdd sur des indices entiers)
+    counts, class_maj = voxeliser_par_blocs(
+        lidar_numpy["x"], lidar_numpy["y"], lidar_numpy["z"], lidar_numpy["classification"],
+        (grille.x_min, grille.y_min, grille.z_min), grille.pas, (nx, ny, nz)
+    )
+    counts = counts.reshape(ny, nx, nz)
+    class_maj = class_maj.reshape(ny, nx, nz)
 
     # === Application du seuil de densité ===
     mask_trop_faible = counts < densite_min
@@ -122,7 +391,45 @@ def LIDAR_couches(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite_min=1)
 
     return counts, class_maj
 
-def LIDAR_couches_export(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite_min=1, prefixe_sauvegarde="layer"):
+
+
+def LIDAR_couches(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite_min=1, grille=None):
+    """
+    Crée un modèle voxelisé 'couche par couche' à partir d'un tableau Numpy d'un nuage de points LiDAR.
+
+    Paramètres
+    ----------
+    lidar_numpy : NuagePoints ou np.ndarray
+        Nuage de points (x, y, z, classification), ou tableau numpy structuré avec ces champs.
+        Les coordonnées peuvent être relatives (NuagePoints, entiers bruts ou float32) : la grille ne dépend que des écarts.
+    taille_xy : float
+        Taille horizontale d’un voxel, résolution (en mètres).
+    hauteur_couche : float
+        Épaisseur verticale d’un layer (en mètres).
+    densite_min : int
+        Nombre minimum de points pour qu’un voxel soit considéré “plein”.
+    grille : GridSpec, optional
+        Grille déjà calculée pour ce nuage (taille_xy et hauteur_couche sont alors ignorés).
+
+    Retour
+    ------
+    counts : np.ndarray (uint8)
+        Nombre de points par voxel (densité, saturée à 255)
+    class_maj : np.ndarray (uint8)
+        Classification majoritaire de chaque voxel
+    """
+
+    # === Grille (bornes du nuage calculées une seule fois) et voxelisation (cœur commun avec LIDAR_couches_export) ===
+    if grille is None:
+        grille = GridSpec.from_lidar(lidar_numpy, taille_xy, hauteur_couche)
+    counts, class_maj = _voxeliser(lidar_numpy, grille, densite_min)
+
+    # === Quantification uint8 (densité saturée à 255 : seul le seuil de densité dépend de sa valeur exacte) ===
+    counts = np.minimum(counts, 255).astype(np.uint8)
+
+    return counts, class_maj
+
+def LIDAR_couches_export(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite_min=1, prefixe_sauvegarde="layer", grille=None):
     """
     Crée un modèle voxelisé 'couche par couche' à partir d'un tableau Numpy d'un nuage de points LiDAR.
 
@@ -133,8 +440,9 @@ def LIDAR_couches_export(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite
 
     Paramètres
     ----------
-    lidar_numpy : np.ndarray
-        Tableau numpy structuré contenant au moins x, y, z.
+    lidar_numpy : NuagePoints ou np.ndarray
+        Nuage de points (x, y, z, classification), ou tableau numpy structuré avec ces champs.
+        Les coordonnées peuvent être relatives (NuagePoints, entiers bruts ou float32) : la grille ne dépend que des écarts.
     taille_xy : float
         Taille horizontale d’un voxel, résolution (en mètres).
     hauteur_couche : float
@@ -143,109 +451,51 @@ def LIDAR_couches_export(lidar_numpy, taille_xy=1.0, hauteur_couche=1.0, densite
         Nombre minimum de points pour qu’un voxel soit considéré “plein”.
     prefixe_sauvegarde : str
         Préfixe des fichiers TIFF générés.
+    grille : GridSpec, optional
+        Grille déjà calculée pour ce nuage (taille_xy et hauteur_couche sont alors ignorés).
 
     Retour
     ------
-    counts : np.ndarray
+    counts : np.ndarray (uint32)
         Nombre de points par voxel (densité)
     class_maj : np.ndarray
         Classification majoritaire de chaque voxel
     """
 
-    # === Étendue de la zone ===
-    x, y, z = lidar_numpy["x"], lidar_numpy["y"], lidar_numpy["z"]
-    classification = lidar_numpy["classification"]
-    
-    x_min, x_max = x.min(), x.max()
-    y_min, y_max = y.min(), y.max()
-    z_min, z_max = z.min(), z.max()
-
-    nx = int(np.ceil((x_max - x_min) / taille_xy))
-    ny = int(np.ceil((y_max - y_min) / taille_xy))
-    nz = int(np.ceil((z_max - z_min) / hauteur_couche))
-
-    print(f"Dimensions voxel grille : {nx} x {ny} x {nz} (XY:{taille_xy}m, Z:{hauteur_couche:.2f}m)")
-
-    # === Indexation vectorisée ===
-    ix = np.floor((x - x_min) / taille_xy).astype(int)
-    iy = np.floor((y - y_min) / taille_xy).astype(int)
-    iz = np.floor((z - z_min) / hauteur_couche).astype(int)
-
-    valid = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny) & (iz >= 0) & (iz < nz)
-    ix, iy, iz, classification = ix[valid], iy[valid], iz[valid], classification[valid]
-
-    # === Comptage des voxels ===
-    counts, _ = np.histogramdd(sample=np.vstack([iy, ix, iz]).T, bins=(ny, nx, nz)) # utilisation de la vectorisation au lieu d'une boucle for qui serait trop gourmande
-    counts = counts.astype(int)
-
-    # === Classe majoritaire vectorisée ===
-    classes_uniques, class_indices = np.unique(classification, return_inverse=True)
-    nbr_classes = len(classes_uniques)
-    voxel_index = np.ravel_multi_index((iy, ix, iz), dims=(ny, nx, nz))
-
-    class_counts = np.zeros((ny*nx*nz, nbr_classes), dtype=np.int32)
-    for c in range(nbr_classes):
-        mask = class_indices == c
-        np.add.at(class_counts[:, c], voxel_index[mask], 1)
-
-    class_counts = class_counts.reshape(ny, nx, nz, nbr_classes)
-
-    # === Trouver l'indice correspondant à la classe 1 (Non classé) => Règle : ignorer "Non classé" (1) s'il y a une autre classe présente ===
-    idx_non_classe = np.where(classes_uniques == 1)[0]
-    if len(idx_non_classe) > 0:
-        idx_non_classe = idx_non_classe[0]
-        # Masque : voxels contenant au moins une autre classe
-        mask_autre = (np.sum(class_counts > 0, axis=-1) > 1) & (class_counts[..., idx_non_classe] > 0)
-        # On met à zéro la classe 1 dans ces voxels
-        class_counts[mask_autre, idx_non_classe] = 0
-
-    # === Classe majoritaire finale ===
-    idx_max = np.argmax(class_counts, axis=-1)
-    class_maj = classes_uniques[idx_max]
-
-    # === Application du seuil de densité ===
-    mask_trop_faible = counts < densite_min
-    counts[mask_trop_faible] = 0
-    class_maj[mask_trop_faible] = 0
+    # === Grille (bornes du nuage calculées une seule fois) et voxelisation (cœur commun avec LIDAR_couches) ===
+    if grille is None:
+        grille = GridSpec.from_lidar(lidar_numpy, taille_xy, hauteur_couche)
+    counts, class_maj = _voxeliser(lidar_numpy, grille, densite_min)
+    ny, nx, nz = counts.shape
+    z_min, hauteur_couche = grille.emprise[2], grille.hauteur_couche
 
     # === Création du dossier de sortie ===
     dossier_sortie = OUTPUT_DIR / "LIDAR_couches"
     os.makedirs(dossier_sortie, exist_ok=True)
 
-    transform = from_origin(x_min, y_max, taille_xy, taille_xy) # crée la transform géoréférencée (affecte coordonnées réelles aux pixels).
+    transform = grille.transform
+
+    # Masque des voxels pleins rangé couche par couche (nz, ny, nx), lignes nord en haut :
+    # chaque couche devient une tranche contiguë au lieu d'une coupe à pas nz dans la grille (y, x, z)
+    pleins = np.ascontiguousarray((counts >= densite_min).transpose(2, 0, 1)[:, ::-1])
 
-    # === Boucle d'export ===
-    for k in range(nz + 1):  # k = 0 → socle marron
+    def exporter_couche(k):
+        """Construit et écrit la couche k (k = 0 → socle marron)."""
         if k == 0:
             # Couche socle marron
-            rgb = np.ones((ny, nx, 3), dtype=np.uint8) * 255
-            rgb[:] = np.array([139, 69, 19], dtype=np.uint8)  # marron
+            img = np.full((ny, nx), PIXEL_SOCLE, dtype=np.uint8)
             save_path = os.path.join(dossier_sortie, f"{prefixe_sauvegarde}_ground.tif")
         else:
-            # Couches voxel
-            couche = counts[:, :, k - 1]
-            mask_plein = couche >= densite_min
-
-            img = np.ones_like(couche, dtype=np.uint8) * 255
-            img[mask_plein] = 0
-            rgb = np.stack([img]*3, axis=-1)
+            # Couches voxel (tranche contiguë, déjà nord en haut)
+            img = np.where(pleins[k - 1], PIXEL_PLEIN, PIXEL_VIDE).astype(np.uint8)
 
             save_path = os.path.join(dossier_sortie, f"{prefixe_sauvegarde}_z{z_min + (k-1)*hauteur_couche:.2f}.tif")
 
-        with rasterio.open(
-            save_path,
-            'w',
-            driver='GTiff',
-            height=ny,
-            width=nx,
-            count=3,
-            dtype='uint8',
-            crs='EPSG:2154',
-            transform=transform
-        ) as dst:
-            rgb = np.flipud(rgb)
-            for i in range(3):
-                dst.write(rgb[:, :, i], i + 1)
+        ecrire_couche_tiff(save_path, img, transform)
+
+    # === Boucle d'export en parallèle : fichiers indépendants, GDAL libère le GIL pendant l'écriture ===
+    with ThreadPoolExecutor(max_workers=NB_ECRITURES_TIFF) as pool:
+        list(pool.map(exporter_couche, range(nz + 1)))
 
     print(f"{nz + 1} couches TIFF exportées (socle inclus).")
     return counts, class_maj
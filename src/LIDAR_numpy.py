@@ -15,6 +15,7 @@ Informations complémentaires :
 
 import sys
 import numpy as np
+from dataclasses import dataclass, field
 from pathlib import Path
 
 # --- Configuration des chemins ---
@@ -72,33 +73,120 @@ def LIDAR_numpy_incomplet(las):
     for attr in attributs_voulus:
         tableau_point[attr] = las[attr]
 
-    tableau_point["x"] = las.X * las.header.scale[0] + las.header.offset[0]
-    tableau_point["y"] = las.Y * las.header.scale[1] + las.header.offset[1]
-    tableau_point["z"] = las.Z * las.header.scale[2] + las.header.offset[2]
+    # Coordonnées réelles écrites directement dans les champs du tableau (aucun temporaire pleine longueur)
+    scale, offset = las.header.scale, las.header.offset
+    for axe, (brut, coord) in enumerate((("X", "x"), ("Y", "y"), ("Z", "z"))):
+        np.multiply(np.asarray(las[brut]), scale[axe], out=tableau_point[coord])
+        tableau_point[coord] += offset[axe]
 
     return tableau_point
 
 
 
-def LIDAR_numpy_utile(las):
-    """Construction du tableau Numpy avec uniquement les attributs : classification, x, y, z"""
+# Nombre de valeurs lues à la fois par min_max : un bloc tient en cache entre le min et le max
+TAILLE_BLOC_MIN_MAX = 1 << 18
 
-    # Attributs voulus 
-    attributs_voulus = ["classification"] 
 
-    # Construction du tableau Numpy avec 'attributs_voulus' et 'coords_converties'
-    dtype = [(attr, las[attr].dtype) for attr in attributs_voulus] + [(coords_converties, np.float64) for coords_converties in ["x","y","z"]]
-    tableau_point = np.zeros(len(las.points), dtype=dtype)
+def min_max(a, taille_bloc=TAILLE_BLOC_MIN_MAX):
+    """
+    Minimum et maximum d'un tableau en une seule lecture de la mémoire.
 
-    # Remplissage du tableau avec les attributs demandés et les coordonnées converties
-    for attr in attributs_voulus:
-        tableau_point[attr] = las[attr]
+    a.min() puis a.max() parcourent chacun tout le tableau ; par blocs, le max relit le bloc
+    encore en cache après le min.
+    """
 
-    tableau_point["x"] = las.X * las.header.scale[0] + las.header.offset[0]
-    tableau_point["y"] = las.Y * las.header.scale[1] + las.header.offset[1]
-    tableau_point["z"] = las.Z * las.header.scale[2] + las.header.offset[2]
+    mins, maxs = [], []
+    for debut in range(0, len(a), taille_bloc):
+        bloc = a[debut:debut + taille_bloc]
+        mins.append(bloc.min())
+        maxs.append(bloc.max())
+    return min(mins).item(), max(maxs).item()
 
-    return tableau_point
+
+
+@dataclass
+class NuagePoints:
+    """
+    Nuage de points en colonnes séparées (SoA) : x, y, z, classification.
+
+    Chaque attribut est un tableau contigu, contrairement aux champs d'un tableau structuré
+    (lus avec un pas égal à la taille d'un enregistrement). Même accès que le tableau
+    structuré : nuage["x"], len(nuage), nuage[indices].
+
+    Les coordonnées sont relatives à `origine` (coin minimal du nuage, en float64), sur 4 octets :
+        - `echelle` fournie (lecture LAS) : entiers int32 bruts du fichier, coordonnée réelle
+          = origine + x * echelle. Exact, la voxelisation peut rester en arithmétique entière.
+        - sinon : float32 en mètres, précision bien inférieure au centimètre sur une dalle de 1 km.
+          Si `origine` n'est pas fournie, x, y, z sont des coordonnées absolues, recentrées ici.
+    La classification est en uint8.
+    """
+
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    classification: np.ndarray
+    origine: tuple = None
+    echelle: tuple = None
+    _bornes: tuple = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.echelle is not None:
+            type_coord = np.int32
+        else:
+            type_coord = np.float32
+            if self.origine is None:
+                # Recentrage en float64 sur le coin minimal, avant la conversion en float32
+                coords = [np.asarray(c, dtype=np.float64) for c in (self.x, self.y, self.z)]
+                self.origine = tuple(float(c.min()) if len(c) else 0.0 for c in coords)
+                self.x, self.y, self.z = (c - o for c, o in zip(coords, self.origine))
+
+        self.x = np.ascontiguousarray(self.x, dtype=type_coord)
+        self.y = np.ascontiguousarray(self.y, dtype=type_coord)
+        self.z = np.ascontiguousarray(self.z, dtype=type_coord)
+        self.classification = np.ascontiguousarray(self.classification, dtype=np.uint8)
+
+    @classmethod
+    def depuis_LAS(cls, X, Y, Z, classification, scale, offset):
+        """
+        Construit le nuage à partir des coordonnées entières brutes d'un fichier LAS (X * scale + offset).
+
+        Les entiers sont recentrés sur leur minimum : l'origine vaut min(X) * scale + offset.
+        """
+
+        coords, origine, bornes = [], [], []
+        for brut, s, o in zip((X, Y, Z), scale, offset):
+            brut = np.asarray(brut)
+            b_min, b_max = min_max(brut) if len(brut) else (0, 0)
+            coords.append(np.subtract(brut, b_min, dtype=np.int32))
+            origine.append(float(b_min * s + o))
+            bornes.append((0, b_max - b_min))
+
+        nuage = cls(*coords, classification=classification, origine=tuple(origine), echelle=tuple(float(s) for s in scale))
+        if len(nuage):
+            # Bornes connues dès le recentrage : aucune passe supplémentaire pour la grille
+            nuage._bornes = tuple(bornes)
+        return nuage
+
+    def bornes(self):
+        """((x_min, x_max), (y_min, y_max), (z_min, z_max)), calculées au premier appel puis réutilisées."""
+        if self._bornes is None:
+            self._bornes = tuple(min_max(c) for c in (self.x, self.y, self.z))
+        return self._bornes
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, cle):
+        if isinstance(cle, str):
+            return getattr(self, cle)
+        return NuagePoints(self.x[cle], self.y[cle], self.z[cle], self.classification[cle], origine=self.origine, echelle=self.echelle)
+
+
+
+def LIDAR_numpy_utile(las):
+    """Construction du nuage de points (colonnes contiguës, coordonnées entières brutes) avec uniquement les attributs : classification, x, y, z"""
+
+    return NuagePoints.depuis_LAS(las.X, las.Y, las.Z, las.classification, las.header.scale, las.header.offset)
 
 
 
@@ -2,7 +2,7 @@
 === Traitement Topologique et Structurel de données LiDAR ===
 
 Ce code permet de :
-- Convertir un modèle voxelisé en graphe 6-connexe (via NetworkX).
+- Convertir un modèle voxelisé en graphe 6-connexe (via NetworkX), ou en grille dense (VoxelField) pour les étapes sans topologie.
 - Nettoyer les données (suppression des éléments volants, filtrage par classe).
 - Corriger les imperfections (remplissage des trous verticaux dans les murs).
 - Optimiser la structure pour l'export LEGO (création de coques, ajout de piliers de soutènement).
@@ -18,8 +18,11 @@ Informations complémentaires :
 # === Importations ===
 
 import sys
+import hashlib
+import itertools
 import numpy as np
 import networkx as nx
+from dataclasses import dataclass
 from pathlib import Path
 
 # --- Configuration des chemins ---
@@ -42,7 +45,249 @@ from LIDAR_couches import LIDAR_couches, LIDAR_couches_LEGO, LIDAR_couches_LEGO_
 
 # === Fonctions principales ===
 
-def voxel_graphe(counts, class_maj):
+# Ordre des 6 voisins (axes de la grille y, x, z) : identique à l'ordre d'adjacence des nœuds de voxel_graphe
+VOISINS_6 = np.array([
+    [-1, 0, 0], [0, -1, 0], [0, 0, -1],
+    [1, 0, 0], [0, 1, 0], [0, 0, 1]
+])
+
+
+def grille_identifiants(counts, bord=0):
+    """
+    Grille int32 des identifiants de voxels pleins (-1 si vide), dans l'ordre de np.flatnonzero(counts).
+
+    Remplace un dictionnaire coordonnées -> identifiant : la recherche d'un voisin devient une
+    lecture (ou une tranche) de la grille. `bord` ajoute une marge de -1 autour de la grille.
+    """
+
+    ids = np.full(tuple(n + 2 * bord for n in counts.shape), -1, dtype=np.int32)
+    interieur = ids[tuple(slice(bord, bord + n) for n in counts.shape)]
+    plein = counts > 0
+    interieur[plein] = np.arange(np.count_nonzero(plein), dtype=np.int32)
+    return ids
+
+
+
+def table_voisins_6(counts):
+    """
+    Précalcule une fois pour toutes les indices des 6 voisins de chaque voxel plein.
+
+    Les voxels sont numérotés dans l'ordre de np.flatnonzero(counts), c'est-à-dire comme
+    les nœuds de voxel_graphe. La grille d'indices est bordée de -1 : aucun test de bord.
+
+    Paramètres
+    ----------
+    counts : np.ndarray
+        Tableau 3D (y, x, z) contenant le nombre de points LiDAR par voxel.
+
+    Retour
+    ------
+    voisins : np.ndarray
+        Tableau (N, 6) int32 des indices des voisins (-1 si absent), colonnes dans l'ordre de VOISINS_6.
+    """
+
+    iy, ix, iz = np.unravel_index(np.flatnonzero(counts), counts.shape)
+    index = grille_identifiants(counts, bord=1)
+
+    voisins = np.empty((len(iy), 6), dtype=np.int32)
+    for k, (dy, dx, dz) in enumerate(VOISINS_6):
+        voisins[:, k] = index[iy + 1 + dy, ix + 1 + dx, iz + 1 + dz]
+    return voisins
+
+
+
+def _table_voisins_coords(coords):
+    """
+    Table (N, 6) des voisins de voxels donnés par leurs coordonnées, dans l'ordre de `coords`.
+
+    Même convention que table_voisins_6, via une grille d'identifiants bordée de -1.
+    Renvoie None si deux voxels partagent les mêmes coordonnées.
+    """
+
+    if len(coords) == 0:
+        return np.empty((0, 6), dtype=np.int32)
+    c = coords - coords.min(axis=0) + 1
+    index = np.full(tuple(c.max(axis=0) + 2), -1, dtype=np.int32)
+    rang = np.arange(len(c), dtype=np.int32)
+    index[c[:, 0], c[:, 1], c[:, 2]] = rang
+    if not np.array_equal(index[c[:, 0], c[:, 1], c[:, 2]], rang):
+        return None
+
+    voisins = np.empty((len(c), 6), dtype=np.int32)
+    for k, (d0, d1, d2) in enumerate(VOISINS_6):
+        voisins[:, k] = index[c[:, 0] + d0, c[:, 1] + d1, c[:, 2] + d2]
+    return voisins
+
+
+
+def _corriger_classes(cl, voisins, class_non_classe, classes_a_propager, max_iter):
+    """
+    Boucle de correction des voxels non classés sur un tableau de classes (modifié en place).
+
+    Les nœuds sont mis à jour dans l'ordre, une correction étant visible dès le nœud suivant.
+    Un nœud ne dépend donc que de ses voisins non classés d'indice inférieur : les nœuds sont
+    traités par vagues, chaque vague regroupant ceux dont ces voisins sont déjà traités, et le
+    vote majoritaire d'une vague est vectorisé. Résultat identique au parcours nœud par nœud.
+    Retourne le nombre total de voxels remplacés.
+    """
+
+    propageables = np.asarray(classes_a_propager)
+    total_remplaces = 0
+    for it in range(max_iter):
+        nodes_nc = np.flatnonzero(cl == class_non_classe)
+        if len(nodes_nc) == 0:
+            break  # Plus de voxels non classés
+
+        # Dépendances : voisins non classés déjà visités dans l'ordre des nœuds (voisin absent : dernière case)
+        vs = voisins[nodes_nc]
+        est_nc = np.zeros(len(cl) + 1, dtype=bool)
+        est_nc[nodes_nc] = True
+        depend = est_nc[vs] & (vs < nodes_nc[:, None]) & (vs >= 0)
+        traite = ~est_nc
+
+        changements = 0
+        restants = np.arange(len(nodes_nc))
+        while len(restants):
+            pret = ~(depend[restants] & ~traite[vs[restants]]).any(axis=1)
+            vague, restants = restants[pret], restants[~pret]
+
+            # Vote des voisins de classe propageable (voisin absent : classe -1, jamais propageable)
+            classes_voisins = np.append(cl, -1)[vs[vague]]
+            votes = (classes_voisins[:, :, None] == propageables).sum(axis=1)
+            meilleur = votes.max(axis=1)
+            vote = meilleur > 0
+            unique = (votes == meilleur[:, None]).sum(axis=1) == 1
+            nouvelles = propageables[votes.argmax(axis=1)]
+
+            # Égalités : même départage que max(set(...), key=count) sur les voisins dans l'ordre
+            for k in np.flatnonzero(vote & ~unique):
+                lst = [c for c in classes_voisins[k].tolist() if c in classes_a_propager]
+                nouvelles[k] = max(set(lst), key=lst.count)
+
+            cl[nodes_nc[vague[vote]]] = nouvelles[vote]
+            traite[nodes_nc[vague]] = True
+            changements += int(np.count_nonzero(vote))
+
+        total_remplaces += changements
+        if changements == 0:
+            break  # Stabilisation atteinte
+
+    return total_remplaces
+
+
+
+@dataclass
+class VoxelField:
+    """
+    Modèle voxelisé dense, alternative légère au graphe NetworkX entre les étapes structurelles.
+
+    Les étapes qui n'utilisent pas la topologie du graphe (filtrage sol, consolidation, remplissage
+    des murs) travaillent directement sur la grille : aucun nœud ni dictionnaire Python par voxel.
+
+    Attributs
+    ---------
+    counts : np.ndarray
+        Tableau 3D (y, x, z) du nombre de nœuds par voxel (0 : vide), comme graphe_voxel.
+    class_maj : np.ndarray
+        Tableau 3D (uint8) des classes des voxels.
+    min_coords : np.ndarray
+        Indices (y, x, z) de la case [0, 0, 0] dans la grille complète.
+    """
+
+    counts: np.ndarray
+    class_maj: np.ndarray
+    min_coords: np.ndarray
+
+    @classmethod
+    def from_voxels(cls, counts, class_maj):
+        """Un nœud par voxel plein, comme voxel_graphe."""
+        plein = counts > 0
+        return cls(plein.astype(np.int32), np.where(plein, class_maj, 0).astype(np.uint8), np.zeros(3, dtype=int))
+
+    @classmethod
+    def from_coords(cls, coords, classes):
+        """Grille rognée sur l'emprise de voxels distincts (tableau (N, 3) y, x, z)."""
+        min_coords = coords.min(axis=0)
+        idx = tuple((coords - min_coords).T)
+        shape = tuple(coords.max(axis=0) - min_coords + 1)
+        counts = np.zeros(shape, dtype=np.int32)
+        class_maj = np.zeros(shape, dtype=np.uint8)
+        counts[idx] = 1
+        class_maj[idx] = classes
+        return cls(counts, class_maj, min_coords)
+
+    def __len__(self):
+        """Nombre de nœuds (équivalent de len(G))."""
+        return int(self.counts.sum())
+
+    def coords_classes(self):
+        """Indices (y, x, z) dans la grille complète et classes des voxels pleins."""
+        plein = self.counts > 0
+        return np.argwhere(plein) + self.min_coords, self.class_maj[plein].astype(int)
+
+    def to_counts_classes(self):
+        """Équivalent de graphe_voxel : copie directe dans la grille complète, sans parcours de nœuds."""
+        coins = tuple(slice(m, m + n) for m, n in zip(self.min_coords, self.counts.shape))
+        shape = tuple(int(m) + n for m, n in zip(self.min_coords, self.counts.shape))
+        counts = np.zeros(shape, dtype=int)
+        class_maj = np.zeros(shape, dtype=int)
+        counts[coins] = self.counts
+        class_maj[coins] = self.class_maj
+
+        print(f"Conversion Voxel : (Total: {np.count_nonzero(counts)} briques)")
+        return counts, class_maj
+
+
+
+# Cache des derniers graphes construits, indexé par le contenu des grilles (et non par id())
+_CACHE_GRAPHES = {}
+TAILLE_CACHE_GRAPHES = 2
+
+
+def _cle_grilles(counts, class_maj):
+    """
+    Clé de cache d'une paire (counts, class_maj) : formes, dtypes et empreinte blake2b des buffers.
+    """
+
+    h = hashlib.blake2b(digest_size=16)
+    for grille in (counts, class_maj):
+        grille = np.ascontiguousarray(grille)
+        h.update(f"{grille.shape}{grille.dtype}".encode())
+        h.update(grille.data)
+    return h.digest()
+
+
+
+def _tableaux_noeuds(G):
+    """
+    Coordonnées (N, 3) et classes (N,) des nœuds de G, dans l'ordre des nœuds.
+
+    Lues dans G.graph["tableaux_noeuds"] (mémorisé par voxel_graphe et les étapes suivantes) tant
+    que ce cache décrit encore les mêmes nœuds dans le même ordre, sinon extraites nœud par nœud.
+    """
+
+    cache = G.graph.get("tableaux_noeuds")
+    if cache is not None and cache["noeuds"] == list(G):
+        return cache["coord"], cache["class_maj"]
+
+    coords = np.array([d['coord'] for _, d in G.nodes(data=True)], dtype=int).reshape(-1, 3)
+    classes = np.array([d['class_maj'] for _, d in G.nodes(data=True)], dtype=int)
+    return coords, classes
+
+
+def _memoriser_tableaux(G, coords, classes):
+    """
+    Mémorise les tableaux des nœuds de G (voir _tableaux_noeuds).
+
+    Une nouvelle entrée est toujours créée : les copies de G (G.copy(), sous-graphes) partagent
+    l'ancienne, qui ne doit pas être modifiée.
+    """
+
+    G.graph["tableaux_noeuds"] = {"noeuds": list(G), "coord": coords, "class_maj": classes}
+
+
+
+def voxel_graphe(counts, class_maj, voisins=None):
     """
     Crée un graphe 6-connexe à partir d’un modèle voxelisé LiDAR.
 
@@ -56,53 +301,65 @@ def voxel_graphe(counts, class_maj):
         Tableau 3D contenant le nombre de points LiDAR par voxel.
     class_maj : np.ndarray
         Tableau 3D des classes majoritaires par voxel.
-    densite_min : int
-        Seuil minimal de densité pour qu’un voxel soit considéré "plein".
+    voisins : np.ndarray, optional
+        Table des voisins précalculée par table_voisins_6 (calculée ici si absente).
 
     Retour
     ------
     G : networkx.Graph
         Graphe 6-connexe des voxels pleins avec attributs.
+        Le graphe est mis en cache pour les mêmes grilles : il ne doit pas être modifié en place
+        (les traitements du module travaillent tous sur des copies).
     """
 
+    cle = _cle_grilles(counts, class_maj)
+    G = _CACHE_GRAPHES.get(cle)
+    if G is not None:
+        print(f"Graphe initial créé : {len(G.nodes())} nœuds, {len(G.edges())} arêtes.")
+        return G
+
     # --- Voxels pleins ---
     mask = counts > 0
     coords = np.argwhere(mask)
-    coord_tuples = [tuple(map(int, c)) for c in coords] 
-    id_map = {coord: i for i, coord in enumerate(coord_tuples)}
-
-    # --- Voisinage 6-connexe ---
-    voisins = np.array([
-        [1, 0, 0], [-1, 0, 0],
-        [0, 1, 0], [0, -1, 0],
-        [0, 0, 1], [0, 0, -1]
-    ])
-    voisins_coords = (coords[:, None, :] + voisins[None, :, :]).reshape(-1, 3)
-
-    # --- Arêtes entre voxels pleins ---
-    plein_set = set(coord_tuples)
-    voisin_pairs = [
-        (tuple(map(int, c1)), tuple(map(int, c2)))
-        for c1, c2 in zip(np.repeat(coords, 6, axis=0), voisins_coords)
-        if tuple(map(int, c2)) in plein_set
-    ]
-    aretes = [(id_map[a], id_map[b]) for a, b in voisin_pairs]
+
+    # --- Arêtes entre voxels pleins : chacune une seule fois, vers les voisins +y, +x, +z ---
+    if voisins is not None:
+        positifs = voisins[:, 3:]
+        existe = positifs >= 0
+        aretes = np.column_stack((np.nonzero(existe)[0], positifs[existe]))
+    else:
+        # Grille d'identifiants (-1 si vide) comparée à elle-même décalée d'un voxel sur chaque axe
+        ids = grille_identifiants(counts)
+        paires = []
+        for axe in range(3):
+            a = ids[(slice(None),) * axe + (slice(None, -1),)]
+            b = ids[(slice(None),) * axe + (slice(1, None),)]
+            m = (a >= 0) & (b >= 0)
+            paires.append(np.column_stack((a[m], b[m])))
+        aretes = np.concatenate(paires)
 
     # --- Création du graphe ---
     G = nx.Graph()
     G.add_nodes_from(range(len(coords)))
-    G.add_edges_from(aretes)
+    G.add_edges_from(aretes.tolist())
+
+    # --- Attributs clairs (conversion en bloc, sans indexation numpy nœud par nœud) ---
+    coords_xyz = coords[:, [1, 0, 2]]
+    classes = class_maj[mask].astype(int)
+    nx.set_node_attributes(G, dict(enumerate(map(tuple, coords_xyz.tolist()))), name='coord')
+    nx.set_node_attributes(G, dict(enumerate(classes.tolist())), name='class_maj')
+    _memoriser_tableaux(G, coords_xyz, classes)
 
-    # --- Attributs clairs ---
-    nx.set_node_attributes(G, {i: (int(coords[i][1]), int(coords[i][0]), int(coords[i][2])) for i in range(len(coords))}, name='coord')
-    nx.set_node_attributes(G, {i: int(class_maj[tuple(coords[i])]) for i in range(len(coords))}, name='class_maj')
+    if len(_CACHE_GRAPHES) >= TAILLE_CACHE_GRAPHES:
+        del _CACHE_GRAPHES[next(iter(_CACHE_GRAPHES))]
+    _CACHE_GRAPHES[cle] = G
 
     print(f"Graphe initial créé : {len(G.nodes())} nœuds, {len(G.edges())} arêtes.")
     return G
 
 
 
-def corriger_voxels_non_classes_iteratif(G, class_non_classe=1, classes_a_propager=[6], class_sol=2, max_iter=5):
+def corriger_voxels_non_classes_iteratif(G, class_non_classe=1, classes_a_propager=[6], class_sol=2, max_iter=5, voisins=None, inplace=False):
     """
     Corrige les voxels non classés (1) par propagation itérative de classes 
     spécifiques (ex: bâtiments) à partir de leurs voisins 6-connexes.
@@ -119,15 +376,32 @@ def corriger_voxels_non_classes_iteratif(G, class_non_classe=1, classes_a_propag
         Classe sol, qu’on ne doit pas propager.
     max_iter : int
         Nombre maximum d’itérations.
+    voisins : np.ndarray, optional
+        Table précalculée par table_voisins_6, valable si G sort directement de voxel_graphe
+        (nœuds 0..N-1). Évite de reparcourir l'adjacence NetworkX à chaque itération.
+    inplace : bool
+        Modifie directement les classes de G au lieu d'en corriger une copie (la topologie n'est
+        jamais modifiée) : évite de dupliquer tout le graphe. À ne pas utiliser sur le graphe
+        mis en cache par voxel_graphe.
 
     Retour
     ------
     G_corr : networkx.Graph
-        Graphe corrigé.
+        Graphe corrigé (G lui-même si inplace).
     """
 
-    G_corr = G.copy()
+    G_corr = G if inplace else G.copy()
 
+    if voisins is not None:
+        coords, cl = _tableaux_noeuds(G_corr)
+        cl = cl.copy()
+        total_remplaces = _corriger_classes(cl, voisins, class_non_classe, classes_a_propager, max_iter)
+        nx.set_node_attributes(G_corr, dict(enumerate(cl.tolist())), name='class_maj')
+        _memoriser_tableaux(G_corr, coords, cl)
+        print(f"Correction classes : {total_remplaces} voxels non classés remplacés en classe {classes_a_propager} (Total: {len(G_corr.nodes())} nœuds).")
+        return G_corr
+
+    G_corr.graph.pop("tableaux_noeuds", None)  # classes modifiées nœud par nœud
     total_remplaces = 0
     
     for it in range(max_iter):
@@ -179,13 +453,14 @@ def graphe_filtre_classes(G, classes_gardees=[1, 2, 3, 4, 5, 6]):
 
     nb_avant = len(G.nodes())
 
-    nodes_valides = [
-        n for n, d in G.nodes(data=True)
-        if d.get('class_maj') in classes_gardees
-    ]
+    coords, classes = _tableaux_noeuds(G)
+    garde = np.isin(classes, classes_gardees)
+    nodes_valides = list(itertools.compress(G, garde.tolist()))
 
     G_filtre = G.subgraph(nodes_valides).copy()
     nb_apres = len(G_filtre.nodes())
+    if list(G_filtre) == nodes_valides:
+        _memoriser_tableaux(G_filtre, coords[garde], classes[garde])
 
     print(f"Filtrage classes : {nb_avant - nb_apres} nœuds enlevés (Total: {nb_apres} nœuds).")
     return G_filtre
@@ -198,33 +473,57 @@ def graphe_filtre_sol(G, class_sol=2):
 
     Paramètres
     ----------
-    G : networkx.Graph
-        Graphe voxelisé.
+    G : networkx.Graph ou VoxelField
+        Graphe voxelisé (ou grille dense).
     class_sol : int
         Code de la classe 'sol' dans la classification LIDAR.
 
     Retour
     ------
-    G_filtre : networkx.Graph
-        Graphe réduit, ne contenant que les composants connectés au sol.
+    G_filtre : networkx.Graph ou VoxelField
+        Graphe réduit (même type que G), ne contenant que les composants connectés au sol.
     """
 
-    nb_avant = len(G.nodes())
-
-    # Trouver les nœuds de classe 'sol'
-    nodes_sol = [n for n, d in G.nodes(data=True) if d.get('class_maj') == class_sol]
-
-    # Identifier les composantes connexes
-    composantes = list(nx.connected_components(G))
-
-    # Garder celles qui contiennent au moins un voxel de sol
-    composantes_valides = [
-        c for c in composantes if any(n in nodes_sol for n in c)
-    ]
-
-    # Fusionner les composantes valides
-    nodes_valides = set().union(*composantes_valides)
-    G_filtre = G.subgraph(nodes_valides).copy()
+    nb_avant = len(G)
+
+    if isinstance(G, VoxelField):
+        # Composantes 6-connexes des voxels pleins, étiquetées sur la grille
+        plein = G.counts > 0
+        labels = _composantes_connexes(table_voisins_6(G.counts))
+        touche_sol = np.zeros(len(labels), dtype=bool)
+        touche_sol[labels[G.class_maj[plein] == class_sol]] = True
+        garde = np.zeros_like(plein)
+        garde[plein] = touche_sol[labels]
+        G_filtre = VoxelField(np.where(garde, G.counts, 0), np.where(garde, G.class_maj, 0).astype(np.uint8), G.min_coords)
+
+        print(f"Filtrage sol : {nb_avant - len(G_filtre)} nœuds enlevés (Total: {len(G_filtre)} nœuds).")
+        return G_filtre
+
+    noeuds = list(G)
+    coords, classes = _tableaux_noeuds(G)
+    voisins = _table_voisins_coords(coords)
+
+    if voisins is not None and np.count_nonzero(voisins[:, 3:] >= 0) == G.number_of_edges():
+        # Arêtes de G = 6-voisinage des coordonnées (graphe issu de voxel_graphe) : union-find
+        # sur la table des voisins, sans parcours des arêtes de NetworkX
+        labels = _composantes_connexes(voisins)
+        touche_sol = np.zeros(len(labels), dtype=bool)
+        touche_sol[labels[classes == class_sol]] = True
+        garde = touche_sol[labels]
+        G_filtre = G.subgraph(itertools.compress(noeuds, garde.tolist())).copy()
+    else:
+        # Trouver les nœuds de classe 'sol' par un masque sur le tableau des classes
+        # (ensemble : test d'appartenance en temps constant)
+        nodes_sol = set(itertools.compress(noeuds, (classes == class_sol).tolist()))
+
+        # Garder les composantes connexes qui contiennent au moins un voxel de sol, enchaînées
+        # directement dans le sous-graphe (ni liste de toutes les composantes, ni union d'ensembles)
+        composantes_valides = (c for c in nx.connected_components(G) if not nodes_sol.isdisjoint(c))
+        G_filtre = G.subgraph(itertools.chain.from_iterable(composantes_valides)).copy()
+        garde = np.fromiter(map(G_filtre.__contains__, noeuds), dtype=bool, count=len(noeuds))
+
+    if list(G_filtre) == list(itertools.compress(noeuds, garde.tolist())):
+        _memoriser_tableaux(G_filtre, coords[garde], classes[garde])
 
     nb_apres = len(G_filtre.nodes())
 
@@ -233,406 +532,390 @@ def graphe_filtre_sol(G, class_sol=2):
 
 
 
-def ajouter_sol_coque_pillier(G, class_sol=2, class_bat=3, n_min=2, pillar_step=4, pillar_width=2):
+def _espace_tableaux(backend):
     """
-    Propagation du sol avec propagation de la HAUTEUR.
-    + OPTIMISATION COQUE : Ne conserve qu'une "coque" du sol.
-    + STRUCTURE : Garde des piliers verticaux pour la solidité.
-    
-    Paramètres additionnels :
-    pillar_step : int
-        Intervalle entre les piliers (ex: 10).
-    pillar_width : int
-        Largeur du pilier en voxels. 
-        Ex: pillar_width=2 crée des piliers de 2x2 briques (plus solides).
+    Module de tableaux (numpy ou cupy) correspondant à `backend`.
+
+    CuPy est optionnel : il n'est importé que s'il est demandé.
     """
 
-    nb_avant = len(G.nodes())
-    coords = np.array([d['coord'] for _, d in G.nodes(data=True)], dtype=int)
-    classes = np.array([d['class_maj'] for _, d in G.nodes(data=True)], dtype=int)
-    if len(coords) == 0: return G.copy()
+    if backend == "numpy":
+        return np
+    if backend == "cupy":
+        try:
+            import cupy
+        except ImportError as e:
+            raise ImportError("backend='cupy' demandé mais CuPy n'est pas installé.") from e
+        return cupy
+    raise ValueError(f"backend inconnu : {backend!r} (attendu : 'numpy' ou 'cupy')")
 
-    # Grille Dense
-    min_coords = coords.min(axis=0)
-    coords_shifted = coords - min_coords 
-    nx_max, ny_max, nz_max = coords_shifted.max(axis=0) + 1
-    grid = np.zeros((nx_max, ny_max, nz_max), dtype=np.int8) 
-    grid[coords_shifted[:,0], coords_shifted[:,1], coords_shifted[:,2]] = classes
 
-    # Propagation (Toujours identique au début)
-    sol_mask = (grid == class_sol); bat_mask = (grid == class_bat)
-    z_indices = np.arange(nz_max); z_height_map = np.zeros((nx_max, ny_max), dtype=int)
-    
-    sol_exist = sol_mask.any(axis=2)
-    if np.any(sol_exist):
-        z_height_map[sol_exist] = nz_max - 1 - np.argmax(sol_mask[..., ::-1], axis=2)[sol_exist]
 
-    sol_fill = sol_exist[:, :, None] & (z_indices[None, None, :] <= z_height_map[:, :, None])
-    grid[sol_fill] = np.where((grid[sol_fill] == 0) | (grid[sol_fill] == class_sol), class_sol, grid[sol_fill])
-    sol_mask = (grid == class_sol)
+def _filtre_3x3(a, op, xp=np):
+    """
+    Combine (op = np.add ou np.maximum) chaque case d'une carte 2D avec ses 8 voisines et elle-même.
 
-    interior_mask = bat_mask.any(axis=2)
-    processed_mask = np.zeros((nx_max, ny_max), dtype=bool)
-    voisins8 = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+    Le voisinage 3x3 est séparable : trois décalages selon le premier axe, puis selon le second.
+    Les décalages sont des vues d'une copie bordée de zéros (neutre pour la somme et pour le
+    maximum de valeurs positives) : hors de la carte, pas de voisin, au lieu du repli torique de np.roll.
+    """
 
-    # Propagation Ext
-    changed = True
-    while changed:
-        changed = False
-        sol_xy = sol_mask.any(axis=2).astype(np.int8)
-        neighbor_count = np.zeros_like(sol_xy); neighbor_max_z = np.zeros((nx_max, ny_max), dtype=int)
-        for dx, dy in voisins8:
-            shifted_sol = np.roll(np.roll(sol_xy, dx, axis=0), dy, axis=1)
-            neighbor_count += shifted_sol
-            shifted_h = np.roll(np.roll(z_height_map, dx, axis=0), dy, axis=1)
-            neighbor_max_z = np.maximum(neighbor_max_z, shifted_h * shifted_sol)
-        candidate = (neighbor_count >= n_min) & (sol_xy == 0) & (~interior_mask) & (~processed_mask)
-        if np.any(candidate):
-            changed = True
-            processed_mask[candidate] = True
-            xs, ys = np.where(candidate)
-            z_targets = neighbor_max_z[xs, ys]
-            for x, y, zt in zip(xs, ys, z_targets):
-                if zt < 0: continue
-                grid[x, y, :zt+1] = np.where(grid[x, y, :zt+1] == 0, class_sol, grid[x, y, :zt+1])
-                z_height_map[x, y] = zt
-            sol_mask = (grid == class_sol)
+    p = xp.pad(a, 1)
+    lignes = op(op(p[:-2], p[1:-1]), p[2:])
+    return op(op(lignes[:, :-2], lignes[:, 1:-1]), lignes[:, 2:])
 
-    # Propagation Sous Bâtiments
-    interior_processing = interior_mask.copy()
-    changed_int = True
-    while changed_int:
-        changed_int = False
-        h_current = z_height_map.copy(); h_max_neighbor = np.zeros_like(h_current)
-        for dx, dy in voisins8:
-            shifted_h = np.roll(np.roll(h_current, dx, axis=0), dy, axis=1)
-            h_max_neighbor = np.maximum(h_max_neighbor, shifted_h)
-        update_mask = interior_processing & (z_height_map == 0) & (h_max_neighbor > 0)
-        if np.any(update_mask):
-            changed_int = True
-            z_height_map[update_mask] = h_max_neighbor[update_mask]
 
-    xs, ys = np.where(interior_mask)
-    if len(xs) > 0:
-        z_tops = z_height_map[xs, ys]
-        for x, y, zt in zip(xs, ys, z_tops):
-             if zt > 0:
-                 col_slice = grid[x, y, :zt+1]
-                 mask_writable = (col_slice == 0) | (col_slice == class_sol)
-                 col_slice[mask_writable] = class_sol
-
-    # === COQUE AVEC PILIERS ===
-    sol_final_mask = (grid == class_sol)
-    is_internal = sol_final_mask.copy()
-    
-    is_internal[:-1, :, :] &= sol_final_mask[1:, :, :]  
-    is_internal[1:, :, :]  &= sol_final_mask[:-1, :, :]  
-    is_internal[:, :-1, :] &= sol_final_mask[:, 1:, :]  
-    is_internal[:, 1:, :]  &= sol_final_mask[:, :-1, :]  
-    is_internal[:, :, :-1] &= sol_final_mask[:, :, 1:]  
-    is_internal[:, :, 1:]  &= sol_final_mask[:, :, :-1]  
-    
-    is_internal[0, :, :] = False; is_internal[-1, :, :] = False
-    is_internal[:, 0, :] = False; is_internal[:, -1, :] = False
-    is_internal[:, :, 0] = False; is_internal[:, :, -1] = False
-
-    # Protection des piliers
-    if pillar_step > 0: 
-        x_indices = np.arange(nx_max)
-        y_indices = np.arange(ny_max)
-        # Piliers de largeur configurable
-        x_pillar_mask = (x_indices % pillar_step) < pillar_width
-        y_pillar_mask = (y_indices % pillar_step) < pillar_width
-        pillar_mask_2d = x_pillar_mask[:, None] & y_pillar_mask[None, :]
-        is_internal[pillar_mask_2d, :] = False # On ne supprime pas les piliers
-
-    grid[is_internal] = 0
-
-    # Reconstruction
-    G_sol = nx.Graph()
-    voxels_finaux = np.argwhere(grid != 0)
-    nodes_list = []
-    for i, (x, y, z) in enumerate(voxels_finaux):
-        real_coord = (x + min_coords[0], y + min_coords[1], z + min_coords[2])
-        nodes_list.append((i, {"coord": real_coord, "class_maj": int(grid[x, y, z])}))
-    G_sol.add_nodes_from(nodes_list)
-    
-    print(f"Ajout sol (Coque+Piliers) : {len(G_sol.nodes()) - nb_avant} voxels ajoutés.")
-    return G_sol
 
-def ajouter_sol_coque(G, class_sol=2, class_bat=3, n_min=2):
+def _erosion_6(masque, xp=np):
     """
-    Propagation du sol avec propagation de la HAUTEUR (bouche les trous sous les objets).
-    + OPTIMISATION : Ne conserve qu'une "coque" (shell) du sol pour économiser les briques.
+    Érosion 6-connexe d'un masque 3D : vrai là où la case et ses 6 voisines directes sont vraies.
+
+    Les cases du bord ne sont jamais internes. Le masque est compacté en bits le long de l'axe
+    vertical (contigu), par mots de 64 bits : les ET selon les axes horizontaux portent sur des
+    vues décalées des mots, et ceux selon l'axe vertical sur des décalages de bits raccordés
+    d'un mot au suivant. Huit fois moins de mémoire parcourue qu'avec un octet par case.
+    Hors numpy (xp = cupy), un ET en place par direction sur le masque booléen.
     """
-    
-    nb_avant = len(G.nodes())
-    coords = np.array([d['coord'] for _, d in G.nodes(data=True)], dtype=int)
-    classes = np.array([d['class_maj'] for _, d in G.nodes(data=True)], dtype=int)
-    if len(coords) == 0: return G.copy()
+
+    if xp is not np:
+        interne = masque.copy()
+        interne[:-1, :, :] &= masque[1:, :, :]
+        interne[1:, :, :]  &= masque[:-1, :, :]
+        interne[:, :-1, :] &= masque[:, 1:, :]
+        interne[:, 1:, :]  &= masque[:, :-1, :]
+        interne[:, :, :-1] &= masque[:, :, 1:]
+        interne[:, :, 1:]  &= masque[:, :, :-1]
+        interne[[0, -1], :, :] = False; interne[:, [0, -1], :] = False; interne[:, :, [0, -1]] = False
+        return interne
+
+    nx, ny, nz = masque.shape
+    nb_mots = -(-nz // 64)
+    octets = np.packbits(masque, axis=2, bitorder='little')
+    octets = np.pad(octets, ((0, 0), (0, 0), (0, 8 * nb_mots - octets.shape[2])))
+    mots = octets.view(np.uint64)
+
+    interne = mots.copy()
+    interne[:-1, :, :] &= mots[1:, :, :]
+    interne[1:, :, :]  &= mots[:-1, :, :]
+    interne[:, :-1, :] &= mots[:, 1:, :]
+    interne[:, 1:, :]  &= mots[:, :-1, :]
+
+    # Voisins vertical inférieur et supérieur : décalage d'un bit, avec le bit de retenue du mot
+    # voisin (hors grille, bits nuls : les deux bords verticaux ne sont jamais internes)
+    dessous = mots << np.uint64(1)
+    dessous[:, :, 1:] |= mots[:, :, :-1] >> np.uint64(63)
+    interne &= dessous
+    dessus = mots >> np.uint64(1)
+    dessus[:, :, :-1] |= mots[:, :, 1:] << np.uint64(63)
+    interne &= dessus
+
+    # Bords horizontaux jamais internes
+    interne[0, :, :] = 0; interne[-1, :, :] = 0
+    interne[:, 0, :] = 0; interne[:, -1, :] = 0
+    return np.unpackbits(interne.view(np.uint8), axis=2, count=nz, bitorder='little').view(bool)
+
+
+
+def _consolider_sol(coords, classes, class_sol=2, class_bat=3, n_min=2, coque=False, pillar_step=0, pillar_width=0,
+                    backend="numpy"):
+    """
+    Cœur commun de la consolidation du sol, sur tableaux plats.
+
+    Propage le sol (et sa hauteur) sous toute la scène et sous les bâtiments, puis,
+    si `coque` est vrai, évide le volume de sol en conservant éventuellement des piliers.
+
+    Paramètres
+    ----------
+    coords : np.ndarray
+        Tableau (N, 3) des indices voxel ; les deux premiers axes sont horizontaux, le troisième vertical.
+    classes : np.ndarray
+        Tableau (N,) des classes des voxels.
+    class_sol, class_bat, n_min :
+        Voir ajouter_sol_rempli.
+    coque : bool
+        Ne conserver qu'une coque du sol (érosion 6-connexe).
+    pillar_step, pillar_width : int
+        Piliers protégés de l'érosion (pillar_step=0 : aucun pilier).
+    backend : str
+        "numpy" (défaut) ou "cupy" : grille dense et propagations sur GPU, algorithme identique.
+
+    Retour
+    ------
+    coords_finaux : np.ndarray
+        Tableau (M, 3) des indices voxel (même convention d'axes que `coords`).
+    classes_finales : np.ndarray
+        Tableau (M,) des classes.
+    """
+
+    xp = _espace_tableaux(backend)
 
     # Grille Dense
     min_coords = coords.min(axis=0)
     coords_shifted = coords - min_coords 
     nx_max, ny_max, nz_max = coords_shifted.max(axis=0) + 1
-    grid = np.zeros((nx_max, ny_max, nz_max), dtype=np.int8) 
-    grid[coords_shifted[:,0], coords_shifted[:,1], coords_shifted[:,2]] = classes
+    # Types compacts : classes LAS sur un octet, hauteurs et comptes de voisins sur 2 et 1 octets
+    grid = xp.zeros((nx_max, ny_max, nz_max), dtype=xp.uint8)
+    coords_shifted = xp.asarray(coords_shifted)
+    grid[coords_shifted[:,0], coords_shifted[:,1], coords_shifted[:,2]] = xp.asarray(classes)
 
-    # Propagation (Identique à Rempli pour avoir le volume complet d'abord)
+    # Masques & Hauteurs
     sol_mask = (grid == class_sol); bat_mask = (grid == class_bat)
-    z_indices = np.arange(nz_max); z_height_map = np.zeros((nx_max, ny_max), dtype=int)
+    z_indices = xp.arange(nz_max, dtype=xp.int16); z_height_map = xp.zeros((nx_max, ny_max), dtype=xp.int16)
     
     sol_exist = sol_mask.any(axis=2)
-    if np.any(sol_exist):
-        z_height_map[sol_exist] = nz_max - 1 - np.argmax(sol_mask[..., ::-1], axis=2)[sol_exist]
+    if xp.any(sol_exist):
+        z_height_map[sol_exist] = nz_max - 1 - xp.argmax(sol_mask[..., ::-1], axis=2)[sol_exist]
 
-    sol_fill = sol_exist[:, :, None] & (z_indices[None, None, :] <= z_height_map[:, :, None])
-    grid[sol_fill] = np.where((grid[sol_fill] == 0) | (grid[sol_fill] == class_sol), class_sol, grid[sol_fill])
-    sol_mask = (grid == class_sol)
+    # Remplissage initial sous sol existant : une seule lecture et une seule écriture des colonnes
+    # ayant du sol (seules les cases vides changent : une case déjà sol le reste)
+    xs, ys = xp.where(sol_exist)
+    colonnes = grid[xs, ys]
+    colonnes[(z_indices <= z_height_map[xs, ys][:, None]) & (colonnes == 0)] = class_sol
+    grid[xs, ys] = colonnes
 
     interior_mask = bat_mask.any(axis=2)
-    processed_mask = np.zeros((nx_max, ny_max), dtype=bool)
-    voisins8 = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+    processed_mask = xp.zeros((nx_max, ny_max), dtype=bool)
+
+    # Les 8 voisins sont lus par un filtre 3x3 séparable (4 décalages au lieu de 16). La case centrale
+    # y est incluse sans effet : seules comptent les cases sans sol (hauteur et sol nuls au centre).
 
-    # Propagation Ext
+    # 1. Propagation Extérieure
+    # (présence de sol par colonne : celle d'avant le remplissage initial, qui n'écrit que dans des
+    # colonnes ayant déjà du sol, puis mise à jour sur les seules colonnes écrites)
+    sol_xy = sol_exist.astype(xp.uint8)
     changed = True
     while changed:
         changed = False
-        sol_xy = sol_mask.any(axis=2).astype(np.int8)
-        neighbor_count = np.zeros_like(sol_xy); neighbor_max_z = np.zeros((nx_max, ny_max), dtype=int)
-        for dx, dy in voisins8:
-            shifted_sol = np.roll(np.roll(sol_xy, dx, axis=0), dy, axis=1)
-            neighbor_count += shifted_sol
-            shifted_h = np.roll(np.roll(z_height_map, dx, axis=0), dy, axis=1)
-            neighbor_max_z = np.maximum(neighbor_max_z, shifted_h * shifted_sol)
+        neighbor_count = _filtre_3x3(sol_xy, xp.add, xp)
+        neighbor_max_z = _filtre_3x3(z_height_map * sol_xy, xp.maximum, xp)
         candidate = (neighbor_count >= n_min) & (sol_xy == 0) & (~interior_mask) & (~processed_mask)
-        if np.any(candidate):
+        if xp.any(candidate):
             changed = True
             processed_mask[candidate] = True
-            xs, ys = np.where(candidate)
+            xs, ys = xp.where(candidate)
             z_targets = neighbor_max_z[xs, ys]
-            for x, y, zt in zip(xs, ys, z_targets):
-                if zt < 0: continue
-                grid[x, y, :zt+1] = np.where(grid[x, y, :zt+1] == 0, class_sol, grid[x, y, :zt+1])
-                z_height_map[x, y] = zt
-            sol_mask = (grid == class_sol)
-
-    # Propagation Sous Bâtiments
+            # Colonnes candidates remplies de sol jusqu'à la hauteur cible (cases vides uniquement)
+            colonnes = grid[xs, ys]
+            colonnes[(z_indices <= z_targets[:, None]) & (colonnes == 0)] = class_sol
+            grid[xs, ys] = colonnes
+            z_height_map[xs, ys] = z_targets
+            sol_xy[xs, ys] = (colonnes == class_sol).any(axis=1)
+
+    # 2. Propagation SOUS les bâtiments
     interior_processing = interior_mask.copy()
     changed_int = True
     while changed_int:
         changed_int = False
-        h_current = z_height_map.copy(); h_max_neighbor = np.zeros_like(h_current)
-        for dx, dy in voisins8:
-            shifted_h = np.roll(np.roll(h_current, dx, axis=0), dy, axis=1)
-            h_max_neighbor = np.maximum(h_max_neighbor, shifted_h)
+        h_max_neighbor = _filtre_3x3(z_height_map, xp.maximum, xp)
         update_mask = interior_processing & (z_height_map == 0) & (h_max_neighbor > 0)
-        if np.any(update_mask):
+        if xp.any(update_mask):
             changed_int = True
             z_height_map[update_mask] = h_max_neighbor[update_mask]
 
-    xs, ys = np.where(interior_mask)
+    # 3. Remplissage Final
+    xs, ys = xp.where(interior_mask & (z_height_map > 0))
     if len(xs) > 0:
-        z_tops = z_height_map[xs, ys]
-        for x, y, zt in zip(xs, ys, z_tops):
-             if zt > 0:
-                 col_slice = grid[x, y, :zt+1]
-                 mask_writable = (col_slice == 0) | (col_slice == class_sol)
-                 col_slice[mask_writable] = class_sol
-
-    # === ÉROSION POUR CRÉER LA COQUE ===
-    sol_final_mask = (grid == class_sol)
-    is_internal = sol_final_mask.copy()
-    
-    # Un voxel est interne si ses 6 voisins directs sont aussi du sol
-    is_internal[:-1, :, :] &= sol_final_mask[1:, :, :]  
-    is_internal[1:, :, :]  &= sol_final_mask[:-1, :, :]  
-    is_internal[:, :-1, :] &= sol_final_mask[:, 1:, :]  
-    is_internal[:, 1:, :]  &= sol_final_mask[:, :-1, :]  
-    is_internal[:, :, :-1] &= sol_final_mask[:, :, 1:]  
-    is_internal[:, :, 1:]  &= sol_final_mask[:, :, :-1]  
-    
-    # Bords jamais internes
-    is_internal[0, :, :] = False; is_internal[-1, :, :] = False
-    is_internal[:, 0, :] = False; is_internal[:, -1, :] = False
-    is_internal[:, :, 0] = False; is_internal[:, :, -1] = False
-    
-    grid[is_internal] = 0 # Suppression de l'intérieur
+        colonnes = grid[xs, ys]
+        # (une case déjà sol le reste : seules les cases vides sont à écrire)
+        colonnes[(z_indices <= z_height_map[xs, ys][:, None]) & (colonnes == 0)] = class_sol
+        grid[xs, ys] = colonnes
+
+    # === ÉROSION POUR CRÉER LA COQUE (AVEC PILIERS) ===
+    if coque:
+        # Un voxel est interne si ses 6 voisins directs sont aussi du sol (bords jamais internes)
+        is_internal = _erosion_6(grid == class_sol, xp)
+
+        # Protection des piliers
+        if pillar_step > 0: 
+            # Piliers de largeur configurable : colonnes (x % pillar_step, y % pillar_step) < pillar_width,
+            # écrites par vues à pas pillar_step (seules les colonnes des piliers sont touchées)
+            largeur = min(pillar_width, pillar_step)
+            for dx in range(largeur):
+                for dy in range(largeur):
+                    is_internal[dx::pillar_step, dy::pillar_step, :] = False # On ne supprime pas les piliers
+
+        grid[is_internal] = 0 # Suppression de l'intérieur
+
+    # Classes lues par le masque (même ordre que argwhere), sans indexation par les coordonnées
+    plein = grid != 0
+    voxels_finaux = xp.argwhere(plein)
+    classes_finales = grid[plein]
+    if xp is not np:
+        # Retour sur l'hôte avant la reconstruction des nœuds
+        voxels_finaux, classes_finales = xp.asnumpy(voxels_finaux), xp.asnumpy(classes_finales)
+    return voxels_finaux + min_coords, classes_finales
+
+
+
+def _graphe_sol(G, **params):
+    """
+    Applique _consolider_sol aux nœuds d'un graphe et reconstruit le graphe résultant (sans arêtes).
 
-    # Reconstruction
+    Sur un VoxelField, les voxels sont lus et réécrits directement dans la grille.
+    """
+
+    if isinstance(G, VoxelField):
+        coords, classes = G.coords_classes()
+        if len(coords) == 0: return VoxelField(G.counts.copy(), G.class_maj.copy(), G.min_coords)
+        return VoxelField.from_coords(*_consolider_sol(coords, classes, **params))
+
+    coords, classes = _tableaux_noeuds(G)
+    if len(coords) == 0: return G.copy()
+
+    voxels_finaux, classes_finales = _consolider_sol(coords, classes, **params)
+    classes_finales = classes_finales.astype(int)
+
+    # Reconstruction (conversions en bloc par tolist(), un seul dictionnaire d'attributs par nœud)
     G_sol = nx.Graph()
-    voxels_finaux = np.argwhere(grid != 0)
-    nodes_list = []
-    for i, (x, y, z) in enumerate(voxels_finaux):
-        real_coord = (x + min_coords[0], y + min_coords[1], z + min_coords[2])
-        nodes_list.append((i, {"coord": real_coord, "class_maj": int(grid[x, y, z])}))
-    G_sol.add_nodes_from(nodes_list)
-    
-    print(f"Ajout sol (Coque) : {len(G_sol.nodes()) - nb_avant} voxels ajoutés.")
+    coords_list = map(tuple, voxels_finaux.tolist())
+    G_sol.add_nodes_from(
+        (i, {"coord": c, "class_maj": k}) for i, (c, k) in enumerate(zip(coords_list, classes_finales.tolist()))
+    )
+    _memoriser_tableaux(G_sol, voxels_finaux, classes_finales)
     return G_sol
 
-def ajouter_sol_rempli(G, class_sol=2, class_bat=3, n_min=2):
 
+
+def ajouter_sol_coque_pillier(G, class_sol=2, class_bat=3, n_min=2, pillar_step=4, pillar_width=2, backend="numpy"):
     """
-    Propagation du sol avec propagation.Ajoute un sol MASSIF sous toute la scène, y compris sous les bâtiments.
-    Propage la hauteur du sol pour éviter les trous.
+    Propagation du sol avec propagation de la HAUTEUR.
+    + OPTIMISATION COQUE : Ne conserve qu'une "coque" du sol.
+    + STRUCTURE : Garde des piliers verticaux pour la solidité.
+    
+    Paramètres additionnels :
+    pillar_step : int
+        Intervalle entre les piliers (ex: 10).
+    pillar_width : int
+        Largeur du pilier en voxels. 
+        Ex: pillar_width=2 crée des piliers de 2x2 briques (plus solides).
+    backend : str
+        "numpy" (défaut) ou "cupy" pour exécuter les propagations sur GPU (CuPy optionnel).
     """
 
-    nb_avant = len(G.nodes())
-    coords = np.array([d['coord'] for _, d in G.nodes(data=True)], dtype=int)
-    classes = np.array([d['class_maj'] for _, d in G.nodes(data=True)], dtype=int)
-    if len(coords) == 0: return G.copy()
-
-    # Grille Dense
-    min_coords = coords.min(axis=0)
-    coords_shifted = coords - min_coords 
-    nx_max, ny_max, nz_max = coords_shifted.max(axis=0) + 1
+    nb_avant = len(G)
+    G_sol = _graphe_sol(G, class_sol=class_sol, class_bat=class_bat, n_min=n_min,
+                        coque=True, pillar_step=pillar_step, pillar_width=pillar_width, backend=backend)
     
-    grid = np.zeros((nx_max, ny_max, nz_max), dtype=np.int8) 
-    grid[coords_shifted[:,0], coords_shifted[:,1], coords_shifted[:,2]] = classes
+    print(f"Ajout sol (Coque+Piliers) : {len(G_sol) - nb_avant} voxels ajoutés.")
+    return G_sol
 
-    # Masques & Hauteurs
-    sol_mask = (grid == class_sol)
-    bat_mask = (grid == class_bat)
-    z_indices = np.arange(nz_max)
-    z_height_map = np.zeros((nx_max, ny_max), dtype=int)
+def ajouter_sol_coque(G, class_sol=2, class_bat=3, n_min=2, backend="numpy"):
+    """
+    Propagation du sol avec propagation de la HAUTEUR (bouche les trous sous les objets).
+    + OPTIMISATION : Ne conserve qu'une "coque" (shell) du sol pour économiser les briques.
+    """
     
-    sol_exist = sol_mask.any(axis=2)
-    if np.any(sol_exist):
-        z_height_map[sol_exist] = nz_max - 1 - np.argmax(sol_mask[..., ::-1], axis=2)[sol_exist]
-
-    # Remplissage initial sous sol existant
-    sol_fill = sol_exist[:, :, None] & (z_indices[None, None, :] <= z_height_map[:, :, None])
-    grid[sol_fill] = np.where((grid[sol_fill] == 0) | (grid[sol_fill] == class_sol), class_sol, grid[sol_fill])
-    sol_mask = (grid == class_sol)
-
-    interior_mask = bat_mask.any(axis=2)
-    processed_mask = np.zeros((nx_max, ny_max), dtype=bool)
-    voisins8 = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
-
-    # 1. Propagation Extérieure
-    changed = True
-    while changed:
-        changed = False
-        sol_xy = sol_mask.any(axis=2).astype(np.int8)
-        neighbor_count = np.zeros_like(sol_xy)
-        neighbor_max_z = np.zeros((nx_max, ny_max), dtype=int)
-        
-        for dx, dy in voisins8:
-            shifted_sol = np.roll(np.roll(sol_xy, dx, axis=0), dy, axis=1)
-            neighbor_count += shifted_sol
-            shifted_h = np.roll(np.roll(z_height_map, dx, axis=0), dy, axis=1)
-            valid_h = shifted_h * shifted_sol 
-            neighbor_max_z = np.maximum(neighbor_max_z, valid_h)
+    nb_avant = len(G)
+    G_sol = _graphe_sol(G, class_sol=class_sol, class_bat=class_bat, n_min=n_min, coque=True, backend=backend)
+    
+    print(f"Ajout sol (Coque) : {len(G_sol) - nb_avant} voxels ajoutés.")
+    return G_sol
 
-        candidate = (neighbor_count >= n_min) & (sol_xy == 0) & (~interior_mask) & (~processed_mask)
-        if np.any(candidate):
-            changed = True
-            processed_mask[candidate] = True
-            xs, ys = np.where(candidate)
-            z_targets = neighbor_max_z[xs, ys]
-            for x, y, zt in zip(xs, ys, z_targets):
-                if zt < 0: continue
-                grid[x, y, :zt+1] = np.where(grid[x, y, :zt+1] == 0, class_sol, grid[x, y, :zt+1])
-                z_height_map[x, y] = zt
-            sol_mask = (grid == class_sol)
+def ajouter_sol_rempli(G, class_sol=2, class_bat=3, n_min=2, backend="numpy"):
 
-    # 2. Propagation SOUS les bâtiments (Correction Robuste)
-    interior_processing = interior_mask.copy()
-    changed_int = True
-    while changed_int:
-        changed_int = False
-        h_current = z_height_map.copy()
-        h_max_neighbor = np.zeros_like(h_current)
-        for dx, dy in voisins8:
-            shifted_h = np.roll(np.roll(h_current, dx, axis=0), dy, axis=1)
-            h_max_neighbor = np.maximum(h_max_neighbor, shifted_h)
-        
-        update_mask = interior_processing & (z_height_map == 0) & (h_max_neighbor > 0)
-        if np.any(update_mask):
-            changed_int = True
-            z_height_map[update_mask] = h_max_neighbor[update_mask]
+    """
+    Propagation du sol avec propagation.Ajoute un sol MASSIF sous toute la scène, y compris sous les bâtiments.
+    Propage la hauteur du sol pour éviter les trous.
+    """
 
-    # 3. Remplissage Final
-    xs, ys = np.where(interior_mask)
-    if len(xs) > 0:
-        z_tops = z_height_map[xs, ys]
-        for x, y, zt in zip(xs, ys, z_tops):
-             if zt > 0:
-                 col_slice = grid[x, y, :zt+1]
-                 mask_writable = (col_slice == 0) | (col_slice == class_sol)
-                 col_slice[mask_writable] = class_sol
-
-    # Reconstruction
-    G_sol = nx.Graph()
-    voxels_finaux = np.argwhere(grid != 0)
-    nodes_list = []
-    for i, (x, y, z) in enumerate(voxels_finaux):
-        real_coord = (x + min_coords[0], y + min_coords[1], z + min_coords[2])
-        nodes_list.append((i, {"coord": real_coord, "class_maj": int(grid[x, y, z])}))
-    G_sol.add_nodes_from(nodes_list)
+    nb_avant = len(G)
+    G_sol = _graphe_sol(G, class_sol=class_sol, class_bat=class_bat, n_min=n_min, coque=False, backend=backend)
     
-    print(f"Ajout sol (Rempli) : {len(G_sol.nodes()) - nb_avant} voxels ajoutés.")
+    print(f"Ajout sol (Rempli) : {len(G_sol) - nb_avant} voxels ajoutés.")
     return G_sol
 
 
 
-def remplir_trous_verticaux(G, classes_batiment=[6]):
+def _trous_verticaux(coords, classes, classes_batiment):
     """
-    Épaissit les murs en remplissant les trous verticaux entre voxels bâtiment.
+    Voxels à ajouter entre deux voxels bâtiment successifs d'une même colonne.
+
+    Paramètres
+    ----------
+    coords : np.ndarray
+        Tableau (N, 3) des indices voxel ; les deux premiers axes sont horizontaux, le troisième vertical.
+    classes : np.ndarray
+        Tableau (N,) des classes des voxels.
+    classes_batiment : list[int]
+        Classes considérées comme bâtiment.
+
+    Retour
+    ------
+    ajouts : np.ndarray
+        Tableau (M, 3) des voxels des trous, colonne par colonne et de bas en haut.
+    classes_ajouts : np.ndarray
+        Tableau (M,) : classe du voxel bâtiment qui surmonte chaque trou.
     """
 
-    nb_avant = len(G.nodes())
+    bat = np.isin(classes, classes_batiment)
+    ordre = np.lexsort((coords[bat, 2], coords[bat, 1], coords[bat, 0]))
+    cb = coords[bat][ordre]
+    classes_b = classes[bat][ordre]
 
-    G2 = G.copy()
+    # Paires de voxels bâtiment successifs d'une même colonne séparés par un trou
+    meme_colonne = (cb[1:, 0] == cb[:-1, 0]) & (cb[1:, 1] == cb[:-1, 1])
+    trou = meme_colonne & (cb[1:, 2] > cb[:-1, 2] + 1)
+    bas, haut = cb[:-1][trou], cb[1:][trou]
+    longueurs = haut[:, 2] - bas[:, 2] - 1
 
-    # --- Regrouper les voxels par colonne (x, y) ---
-    colonnes = {}
-    for n, d in G.nodes(data=True):
-        x, y, z = d["coord"]
-        colonnes.setdefault((x, y), []).append((z, d['class_maj']))
+    ajouts = np.repeat(bas, longueurs, axis=0)
+    decalage = np.arange(longueurs.sum()) - np.repeat(np.cumsum(longueurs) - longueurs, longueurs)
+    ajouts[:, 2] += decalage + 1
+    return ajouts, np.repeat(classes_b[1:][trou], longueurs)
 
-    # --- Parcourir chaque colonne ---
-    for (x, y), lst in colonnes.items():
 
-        # trier verticalement
-        lst_sorted = sorted(lst, key=lambda t: t[0])
-        Z = [z for z, c in lst_sorted]
-        C = [c for z, c in lst_sorted]
 
-        # trouver les indices où classe = bâtiment
-        idx_bat = [i for i, c in enumerate(C) if c in classes_batiment]
-        if len(idx_bat) < 2:
-            continue  # rien à remplir
+def remplir_trous_verticaux(G, classes_batiment=[6]):
+    """
+    Épaissit les murs en remplissant les trous verticaux entre voxels bâtiment.
 
-        # parcourir les paires successives de voxels bâtiment
-        for i1, i2 in zip(idx_bat[:-1], idx_bat[1:]):
-            z1 = Z[i1]
-            z2 = Z[i2]
+    Accepte un graphe ou un VoxelField (renvoie le même type).
+    """
 
-            # Trou vertical ?
-            if z2 > z1 + 1:
-                # prendre la classe du voxel supérieur
-                classe = C[i2]
+    nb_avant = len(G)
 
-                # Remplir les z manquants
-                for z_new in range(z1 + 1, z2):
-                    node = (x, y, z_new)
+    if isinstance(G, VoxelField):
+        # Pour chaque case : indice du prochain voxel bâtiment au-dessus (nz si aucun), voxel bâtiment en dessous
+        bat = np.isin(G.class_maj, classes_batiment) & (G.counts > 0)
+        nz = bat.shape[2]
+        dessus = np.where(bat, np.arange(nz), nz)
+        dessus = np.minimum.accumulate(dessus[..., ::-1], axis=2)[..., ::-1]
+        trou = ~bat & (dessus < nz) & np.logical_or.accumulate(bat, axis=2)
 
-                    if node not in G2:
+        # Nœud ajouté dans chaque trou, avec la classe du voxel supérieur (mêmes priorités que graphe_voxel)
+        classe = np.take_along_axis(G.class_maj, np.minimum(dessus, nz - 1), axis=2)
+        counts = G.counts + trou
+        class_maj = G.class_maj.copy()
+        remplacer = trou & ((class_maj == 0) | ((class_maj == 1) & (classe != 1)))
+        class_maj[remplacer] = classe[remplacer]
+        G2 = VoxelField(counts, class_maj, G.min_coords)
 
-                        G2.add_node(
-                            node,
-                            coord=(x, y, z_new),
-                            class_maj=classe
-                        )
+        print(f"Remplissage murs : {len(G2) - nb_avant} nœuds rajoutés (Total: {len(G2)} nœuds).")
+        return G2
 
-                        # Connectivité verticale
-                        if (x, y, z_new - 1) in G2:
-                            G2.add_edge(node, (x, y, z_new - 1))
+    G2 = G.copy()
 
-                        if (x, y, z_new + 1) in G2:
-                            G2.add_edge(node, (x, y, z_new + 1))
+    # --- Trous entre voxels bâtiment successifs de chaque colonne (x, y), calculés en bloc ---
+    coords, classes = _tableaux_noeuds(G)
+    ajouts, classes_ajouts = _trous_verticaux(coords, classes, classes_batiment)
+
+    # --- Ajout des nœuds absents, puis de leur connectivité verticale ---
+    nouveaux = {}
+    for (x, y, z), classe in zip(map(tuple, ajouts.tolist()), classes_ajouts.tolist()):
+        if (x, y, z) not in G2:
+            nouveaux[(x, y, z)] = {"coord": (x, y, z), "class_maj": classe}
+    G2.add_nodes_from(nouveaux.items())
+    for (x, y, z) in nouveaux:
+        for voisin in ((x, y, z - 1), (x, y, z + 1)):
+            if voisin in G2:
+                G2.add_edge((x, y, z), voisin)
+
+    if nouveaux:
+        _memoriser_tableaux(
+            G2,
+            np.concatenate((coords, np.array(list(nouveaux), dtype=int).reshape(-1, 3))),
+            np.concatenate((classes, np.array([d["class_maj"] for d in nouveaux.values()], dtype=int)))
+        )
 
     nb_apres = len(G2.nodes())
     print(f"Remplissage murs : {nb_apres - nb_avant} nœuds rajoutés (Total: {nb_apres} nœuds).")
@@ -662,23 +945,29 @@ def graphe_voxel(G):
     """
 
     # --- Récupération des coordonnées et classes depuis le graphe ---
-    coords = np.array([ (data['coord'][1], data['coord'][0], data['coord'][2])  # inverser X/Y pour cohérence
-                        for _, data in G.nodes(data=True) ], dtype=int)
-    classes = np.array([ data['class_maj'] for _, data in G.nodes(data=True) ], dtype=int)
+    coords, classes = _tableaux_noeuds(G)
+    coords = coords[:, [1, 0, 2]]  # inverser X/Y pour cohérence
 
     # --- Dimensions du tableau voxel ---
     ny, nx, nz = coords.max(axis=0) + 1  # +1 car indices commencent à 0
 
-    # --- Initialisation ---
-    counts = np.zeros((ny, nx, nz), dtype=int)
+    # --- Remplissage : nombre de nœuds par voxel ---
+    lin = np.ravel_multi_index(tuple(coords.T), (ny, nx, nz))
+    counts = np.bincount(lin, minlength=ny * nx * nz).reshape(ny, nx, nz)
     class_maj = np.zeros((ny, nx, nz), dtype=int)
 
-    # --- Remplissage ---
-    for (y, x, z), c in zip(coords, classes):
-        counts[y, x, z] += 1
-        # Priorité : si le voxel contient déjà un autre point non-classé (1), le remplacer
-        if class_maj[y, x, z] == 0 or (class_maj[y, x, z] == 1 and c != 1):
-            class_maj[y, x, z] = c
+    # --- Classe : priorité à une classe autre que vide (0) ou non classé (1) ---
+    # Dans l'ordre des nœuds, un voxel prend la classe du nœud suivant tant qu'il est à 0 ou 1 :
+    # il garde la première classe hors {0, 1}, sinon la dernière rencontrée.
+    ordre = np.argsort(lin, kind="stable")
+    lin_tries, classes_triees = lin[ordre], classes[ordre]
+    voxels, debuts = np.unique(lin_tries, return_index=True)
+    classe_voxel = classes_triees[np.append(debuts[1:], len(lin_tries)) - 1]
+
+    fixe = (classes_triees != 0) & (classes_triees != 1)
+    voxels_fixes, premiers = np.unique(lin_tries[fixe], return_index=True)
+    classe_voxel[np.searchsorted(voxels, voxels_fixes)] = classes_triees[fixe][premiers]
+    class_maj.ravel()[voxels] = classe_voxel
 
     nb_briques = np.count_nonzero(counts)
     print(f"Conversion Voxel : (Total: {nb_briques} briques)")
@@ -690,6 +979,191 @@ def graphe_voxel(G):
 
 
 
+# === Chaîne structurelle fusionnée (tableaux plats, sans graphe) ===
+
+@dataclass
+class ContexteStructurel:
+    """
+    État partagé par les étapes de la chaîne structurelle fusionnée.
+
+    Attributs
+    ---------
+    coords : np.ndarray
+        Tableau (N, 3) des indices (y, x, z) des voxels, dans l'ordre des nœuds.
+    classes : np.ndarray
+        Tableau (N,) des classes des voxels.
+    voisins : np.ndarray ou None
+        Table (N, 6) des voisins 6-connexes (-1 si absent), None une fois la topologie abandonnée.
+    composantes : np.ndarray ou None
+        Étiquette de composante connexe de chaque voxel (plus petit indice de la composante),
+        calculée à la demande puis conservée tant que les étapes ne coupent aucune composante.
+    """
+
+    coords: np.ndarray
+    classes: np.ndarray
+    voisins: np.ndarray = None
+    composantes: np.ndarray = None
+
+    def etiquettes(self):
+        """Retourne les étiquettes de composantes connexes (calculées une seule fois)."""
+        if self.composantes is None:
+            self.composantes = _composantes_connexes(self.voisins)
+        return self.composantes
+
+    def garder(self, masque, composantes_entieres=False):
+        """
+        Restreint le contexte aux voxels gardés (ordre conservé) et renumérote voisins et étiquettes.
+
+        Les étiquettes ne restent valides que si aucun voxel n'est enlevé, ou si seules des
+        composantes entières le sont (composantes_entieres=True) ; sinon elles sont invalidées.
+        """
+
+        if masque.all():
+            return
+        nouvel_index = np.full(len(self.coords) + 1, -1, dtype=np.int32)  # dernière case : voisin absent (-1)
+        nouvel_index[:-1][masque] = np.arange(np.count_nonzero(masque), dtype=np.int32)
+
+        self.coords = self.coords[masque]
+        self.classes = self.classes[masque]
+        if self.voisins is not None:
+            self.voisins = nouvel_index[self.voisins[masque]]
+        if self.composantes is not None and composantes_entieres:
+            self.composantes = nouvel_index[self.composantes[masque]]
+        else:
+            self.composantes = None
+
+
+def _composantes_connexes(voisins):
+    """
+    Étiquette les composantes connexes (étiquette = plus petit indice de la composante).
+
+    Union-find vectorisé sur la liste des arêtes (voisins +y, +x, +z) : à chaque tour, la racine
+    la plus grande de chaque arête est accrochée à la plus petite, puis les chemins sont compressés
+    (parent[parent]). Quelques tours suffisent, au lieu d'une propagation voisin par voisin
+    dont le nombre de passes croît avec le diamètre des composantes.
+    """
+
+    positifs = voisins[:, 3:]
+    existe = positifs >= 0
+    u, v = np.nonzero(existe)[0], positifs[existe].astype(np.intp)
+
+    parent = np.arange(len(voisins))
+    while True:
+        pu, pv = parent[u], parent[v]
+        a_relier = pu != pv
+        if not a_relier.any():
+            return parent
+        u, v, pu, pv = u[a_relier], v[a_relier], pu[a_relier], pv[a_relier]
+
+        # Accrochage : parent[x] <= x reste vrai, la racine est donc le plus petit indice
+        np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+        while True:
+            compresse = parent[parent]
+            if np.array_equal(compresse, parent):
+                break
+            parent = compresse
+
+
+def pipeline_structurel(counts, class_maj, correction=None, filtre_classes=None, filtre_sol=None,
+                        consolidation=None, remplissage=None):
+    """
+    Enchaîne les traitements structurels sur des tableaux plats, sans construire de graphe NetworkX.
+
+    Équivalent à voxel_graphe -> corriger_voxels_non_classes_iteratif -> graphe_filtre_classes
+    -> graphe_filtre_sol -> ajouter_sol_* -> remplir_trous_verticaux -> graphe_voxel,
+    mais les voxels pleins ne sont énumérés qu'une fois et la grille traitée n'est écrite qu'une fois.
+
+    Paramètres
+    ----------
+    counts : np.ndarray
+        Tableau 3D (y, x, z) du nombre de points par voxel.
+    class_maj : np.ndarray
+        Tableau 3D des classes majoritaires.
+    correction, filtre_classes, filtre_sol, remplissage : dict ou None
+        Paramètres des étapes correspondantes (None : étape désactivée).
+    consolidation : dict ou None
+        Paramètres de consolidation du sol, avec la clé "mode" ("PILIERS", "COQUE" ou "REMPLI").
+
+    Retour
+    ------
+    counts : np.ndarray
+        Tableau 3D avec le nombre de nœuds par voxel.
+    class_maj : np.ndarray
+        Tableau 3D avec la classe majoritaire de chaque voxel.
+    """
+
+    # --- Énumération unique des voxels pleins (ordre des nœuds de voxel_graphe) ---
+    plein = np.flatnonzero(counts)
+    ctx = ContexteStructurel(
+        coords=np.column_stack(np.unravel_index(plein, counts.shape)),
+        classes=class_maj.ravel()[plein].astype(int),
+        voisins=table_voisins_6(counts)
+    )
+    print(f"Graphe initial créé : {len(ctx.coords)} nœuds, {np.count_nonzero(ctx.voisins >= 0) // 2} arêtes.")
+
+    # --- Correction des voxels non classés (mise à jour en place, dans l'ordre des nœuds) ---
+    if correction is not None:
+        classes_a_propager = correction.get("classes_a_propager", [6])
+        total_remplaces = _corriger_classes(ctx.classes, ctx.voisins, correction.get("class_non_classe", 1),
+                                            classes_a_propager, correction.get("max_iter", 5))
+        print(f"Correction classes : {total_remplaces} voxels non classés remplacés en classe {classes_a_propager} (Total: {len(ctx.coords)} nœuds).")
+
+    # --- Filtrage des classes ---
+    if filtre_classes is not None:
+        nb_avant = len(ctx.coords)
+        ctx.garder(np.isin(ctx.classes, filtre_classes.get("classes_gardees", [1, 2, 3, 4, 5, 6])))
+        print(f"Filtrage classes : {nb_avant - len(ctx.coords)} nœuds enlevés (Total: {len(ctx.coords)} nœuds).")
+
+    # --- Suppression des composantes non connectées au sol ---
+    if filtre_sol is not None:
+        nb_avant = len(ctx.coords)
+        labels = ctx.etiquettes()
+        touche_sol = np.zeros(len(labels), dtype=bool)
+        touche_sol[labels[ctx.classes == filtre_sol.get("class_sol", 2)]] = True
+        ctx.garder(touche_sol[labels], composantes_entieres=True)
+        print(f"Filtrage sol : {nb_avant - len(ctx.coords)} nœuds enlevés (Total: {len(ctx.coords)} nœuds).")
+
+    coords, classes = ctx.coords, ctx.classes
+
+    # --- Consolidation du sol (les deux axes horizontaux jouent des rôles symétriques) ---
+    if consolidation is not None and len(coords) > 0:
+        params = dict(consolidation)
+        mode = params.pop("mode")
+        if mode != "PILIERS":
+            params.pop("pillar_step", None); params.pop("pillar_width", None)
+        params["coque"] = mode != "REMPLI"
+        nb_avant = len(coords)
+        coords, classes = _consolider_sol(coords, classes, **params)
+        classes = classes.astype(int)
+        libelle = {"PILIERS": "Coque+Piliers", "COQUE": "Coque", "REMPLI": "Rempli"}[mode]
+        print(f"Ajout sol ({libelle}) : {len(coords) - nb_avant} voxels ajoutés.")
+
+    # --- Remplissage des trous verticaux entre voxels bâtiment d'une même colonne ---
+    ajouts = np.empty((0, 3), dtype=int)
+    classes_ajouts = np.empty(0, dtype=int)
+    if remplissage is not None:
+        ajouts, classes_ajouts = _trous_verticaux(coords, classes, remplissage.get("classes_batiment", [6]))
+        print(f"Remplissage murs : {len(ajouts)} nœuds rajoutés (Total: {len(coords) + len(ajouts)} nœuds).")
+
+    # --- Écriture unique de la grille traitée (mêmes priorités que graphe_voxel) ---
+    tous = np.concatenate((coords, ajouts))
+    shape = tuple(tous.max(axis=0) + 1)
+    counts_traite = np.zeros(shape, dtype=int)
+    class_maj_traite = np.zeros(shape, dtype=int)
+
+    np.add.at(counts_traite, tuple(tous.T), 1)
+    class_maj_traite[tuple(coords.T)] = classes
+    if len(ajouts):
+        actuelle = class_maj_traite[tuple(ajouts.T)]
+        remplacer = (actuelle == 0) | ((actuelle == 1) & (classes_ajouts != 1))
+        class_maj_traite[tuple(ajouts[remplacer].T)] = classes_ajouts[remplacer]
+
+    print(f"Conversion Voxel : (Total: {np.count_nonzero(counts_traite)} briques)")
+    return counts_traite, class_maj_traite
+
+
+
+
 # === Lancement du script ===
 
 if __name__ == "__main__":
@@ -735,34 +1209,34 @@ if __name__ == "__main__":
     )
     print(f"   -> Grille obtenue : {counts.shape}\n")
 
-    # 3. CRÉATION DU GRAPHE
-    # ---------------------
-    print("3. Conversion en Graphe 6-connexe...")
-    G = voxel_graphe(counts, class_maj)
+    # 3. GRILLE DE TRAVAIL
+    # --------------------
+    print("3. Conversion en grille de travail (VoxelField)...")
+    vf = VoxelField.from_voxels(counts, class_maj)
 
     # 4. TRAITEMENTS TOPOLOGIQUES
     # ---------------------------
     
     # A. Filtrage des composants volants (bruit)
     print("4A. Filtrage : Suppression des éléments non connectés au sol...")
-    G_clean = graphe_filtre_sol(G, class_sol=2)
-    print(f"    -> Reste {len(G_clean.nodes())} noeuds après nettoyage.\n")
+    vf_clean = graphe_filtre_sol(vf, class_sol=2)
+    print(f"    -> Reste {len(vf_clean)} noeuds après nettoyage.\n")
 
     # B. Remplissage des murs (bâtiments)
     print("4B. Correction : Remplissage vertical des murs de bâtiments (classe 6)...")
-    G_filled = remplir_trous_verticaux(G_clean, classes_batiment=[6])
-    print(f"    -> {len(G_filled.nodes()) - len(G_clean.nodes())} voxels ajoutés.\n")
+    vf_filled = remplir_trous_verticaux(vf_clean, classes_batiment=[6])
+    print(f"    -> {len(vf_filled) - len(vf_clean)} voxels ajoutés.\n")
 
     # C. Ajout des fondations (Coque + Piliers)
     print("4C. Structure : Ajout d'une coque de sol et de piliers de soutènement...")
     # On définit class_bat=6 pour que le sol ne remplisse pas l'intérieur des bâtiments si nécessaire
-    G_final = ajouter_sol_coque_pillier(G_filled, class_sol=2, class_bat=6, n_min=1, pillar_step=4, pillar_width=2)
-    print(f"    -> Graphe final : {len(G_final.nodes())} noeuds.\n")
+    vf_final = ajouter_sol_coque_pillier(vf_filled, class_sol=2, class_bat=6, n_min=1, pillar_step=4, pillar_width=2)
+    print(f"    -> Grille finale : {len(vf_final)} noeuds.\n")
 
     # 5. RETOUR VERS NUMPY ET EXPORT
     # ------------------------------
-    print("5. Conversion inverse (Graphe -> Numpy) et Export LDraw...")
-    final_counts, final_class_maj = graphe_voxel(G_final)
+    print("5. Conversion inverse (Grille -> Numpy) et Export LDraw...")
+    final_counts, final_class_maj = vf_final.to_counts_classes()
     
     nom_sortie = "Resultat_Traitement_Structure.ldr"
     voxel_LDRAW_classif(final_counts, final_class_maj, nom_fichier=output_path_test / nom_sortie)
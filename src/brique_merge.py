@@ -19,7 +19,7 @@ from LIDAR_numpy import LIDAR_numpy_utile
 from LIDAR_couches import LIDAR_couches, LIDAR_couches_LEGO, LIDAR_couches_LEGO_LDRAW
 from LIDAR_LDRAW import voxel_LDRAW, voxel_LDRAW_classif
 
-from merge import Brick
+from merge import Brick, BrickArray
 
 # === Paramètres de conversion LDraw ===
 SCALE_XY = 20.0
@@ -62,11 +62,68 @@ LIDAR_TO_LEGO_COLORS = {
 # si VISUALISATION = "GRIS"
 DEFAULT_GRAY = 16 
 
+def construire_lut_LEGO(palette):
+    """Table dense classe -> couleur d'une palette (DEFAULT_GRAY pour les classes absentes)."""
+    lut = np.full(max(256, max(palette) + 1), DEFAULT_GRAY, dtype=np.int32)
+    for classe, couleur in palette.items():
+        lut[classe] = couleur
+    return lut
+
+# Table active, construite une seule fois (remplaçable via definir_palette_LEGO)
+_LUT_LEGO = construire_lut_LEGO(LIDAR_TO_LEGO_COLORS)
+
+
+def definir_palette_LEGO(palette):
+    """Remplace la palette utilisée par bricks_from_numpy(_soa) et runs_from_numpy (ex : palette HEX de main.py)."""
+    global LIDAR_TO_LEGO_COLORS, _LUT_LEGO
+    LIDAR_TO_LEGO_COLORS = palette
+    _LUT_LEGO = construire_lut_LEGO(palette)
+
+
+# Colonnes lues dans une ligne de pièce LDraw "1 <couleur> <x> <y> <z> ..." (y vertical)
+_LDR_DTYPE = [("color", np.int64), ("x", np.float64), ("z", np.float64), ("y", np.float64)]
+
+
+def _est_ligne_piece(ligne):
+    """Vrai si le premier mot de la ligne est "1" (ligne de pièce LDraw)."""
+    t = ligne.lstrip()
+    return t[:1] == "1" and (len(t) == 1 or t[1].isspace())
+
 
 def bricks_from_ldr(lignes):
     """
     Convertit des lignes LDraw en objets Brick en corrigeant l'échelle.
     Gère les coordonnées et la couleur.
+
+    Les lignes de pièces sont lues en bloc par np.loadtxt (couleur entière, trois coordonnées) ;
+    si l'une d'elles est mal formée, repli sur la lecture ligne par ligne qui l'ignore.
+    """
+    lignes = list(lignes)
+    pieces = [l for l in lignes if _est_ligne_piece(l)]
+    if not pieces:
+        return []
+
+    try:
+        raw = np.loadtxt(pieces, usecols=(1, 2, 3, 4), dtype=_LDR_DTYPE, comments=None, ndmin=1)
+    except ValueError:
+        return _bricks_from_ldr_lignes(lignes)
+    if not all(np.isfinite(raw[c]).all() for c in ("x", "z", "y")):
+        return _bricks_from_ldr_lignes(lignes)
+
+    # Conversion inverse (LDraw -> Grille Voxel 1x1) : x = ix * 20, y = iy * 20, z = -iz * 24
+    ix = np.rint(raw["x"] / SCALE_XY).astype(np.int64)
+    iy = np.rint(raw["y"] / SCALE_XY).astype(np.int64)
+    iz = np.rint(-raw["z"] / SCALE_Z).astype(np.int64)
+
+    return [
+        Brick(layer=z, x=x, y=y, length=1, width=1, color=c, orientation="H")
+        for z, x, y, c in zip(iz.tolist(), ix.tolist(), iy.tolist(), raw["color"].tolist())
+    ]
+
+
+def _bricks_from_ldr_lignes(lignes):
+    """
+    Lecture ligne par ligne de bricks_from_ldr (les lignes mal formées sont ignorées).
     """
     bricks = []
 
@@ -107,6 +164,19 @@ def bricks_from_ldr(lignes):
     return bricks
 
 
+def couleurs_lego(classes):
+    """
+    Couleurs LDraw d'un tableau de classes LIDAR, lues dans la table _LUT_LEGO
+    (agrandie seulement si une classe dépasse sa taille).
+    """
+    classes = np.asarray(classes)
+    lut = _LUT_LEGO
+    if classes.size and int(classes.max()) >= len(lut):
+        lut = np.full(int(classes.max()) + 1, DEFAULT_GRAY, dtype=np.int32)
+        lut[:len(_LUT_LEGO)] = _LUT_LEGO
+    return lut[classes]
+
+
 def bricks_from_numpy(counts, class_maj=None, visualisation="COULEUR"):
     """
     Convertit les tableaux NumPy (voxels) en objets Brick.
@@ -117,32 +187,96 @@ def bricks_from_numpy(counts, class_maj=None, visualisation="COULEUR"):
         "COULEUR" => utilise la classification LIDAR mappée vers LEGO.
         "GRIS"    => utilise DEFAULT_GRAY (16).
     """
-    bricks = []
-    indices = np.argwhere(counts > 0)
-    
-    for iy, ix, iz in indices:
-        
-        lego_color = DEFAULT_GRAY
+    iy, ix, iz = np.nonzero(counts)
 
-        # Gestion de la couleur
-        if visualisation == "COULEUR" and class_maj is not None:
-            c_lidar = class_maj[iy, ix, iz]
-            lego_color = LIDAR_TO_LEGO_COLORS.get(c_lidar, DEFAULT_GRAY)
-        
-        # Création de la brique unitaire
-        b = Brick(
-            layer=iz,
-            x=ix,
-            y=iy,
-            length=1,
-            width=1,
-            color=lego_color,
-            orientation="H"
-        )
-        bricks.append(b)
+    # Couleurs calculées en bloc, seule la création des briques reste en Python
+    if visualisation == "COULEUR" and class_maj is not None:
+        couleurs = couleurs_lego(class_maj[iy, ix, iz])
+    else:
+        couleurs = np.full(len(iy), DEFAULT_GRAY, dtype=np.int32)
 
-    return bricks
+    return [
+        Brick(layer=z, x=x, y=y, length=1, width=1, color=c, orientation="H")
+        for y, x, z, c in zip(iy.tolist(), ix.tolist(), iz.tolist(), couleurs.tolist())
+    ]
+
+
+
+
+def bricks_from_numpy_soa(counts, class_maj=None, visualisation="COULEUR"):
+    """
+    Variante de bricks_from_numpy renvoyant un BrickArray (colonnes NumPy) au lieu d'une liste de Brick.
+    Les briques sont dans le même ordre (parcours de la grille en (y, x, z)).
+    """
+    iy, ix, iz = np.nonzero(counts)
+    n = len(iy)
+
+    if visualisation == "COULEUR" and class_maj is not None:
+        color = couleurs_lego(class_maj[iy, ix, iz])
+    else:
+        color = np.full(n, DEFAULT_GRAY, dtype=np.int32)
+
+    return BrickArray(
+        layer=iz.astype(np.int32),
+        x=ix.astype(np.int32),
+        y=iy.astype(np.int32),
+        length=np.ones(n, dtype=np.int32),
+        width=np.ones(n, dtype=np.int32),
+        color=color,
+        orientation=np.zeros(n, dtype=np.uint8)
+    )
+
+
+
+def _runs_lignes(grille):
+    """
+    Runs (suites de cases consécutives de même couleur, -1 = vide) le long du dernier axe d'une grille 3D.
+    Retourne (indices des deux premiers axes, début, longueur), dans l'ordre de parcours de la grille.
+    """
+    bord = np.full(grille.shape[:-1] + (1,), -1, dtype=grille.dtype)
+    pleine = grille != -1
+    debut = pleine & (grille != np.concatenate((bord, grille[..., :-1]), axis=-1))
+    fin = pleine & (grille != np.concatenate((grille[..., 1:], bord), axis=-1))
+    i0, i1, start = np.nonzero(debut)
+    stop = np.nonzero(fin)[2]
+    return i0, i1, start, stop - start + 1
+
+
+def runs_from_numpy(counts, class_maj=None, visualisation="COULEUR"):
+    """
+    Runs de la passe 1 du solver lus directement sur la grille de voxels, sans créer de briques 1x1.
+
+    Équivalent de solver.find_runs_array(bricks_from_numpy_soa(...)) : les couches paires sont
+    parcourues selon X ("H"), les impaires selon Y ("V"), et un run s'arrête à une case vide ou
+    à un changement de couleur.
+
+    Retour
+    ------
+    (layer, x, y, total_len, width_ref, color) : colonnes NumPy des runs, triés par couche puis
+    (transverse, principal), à passer à solver.solve_greedy_stripe_runs.
+    """
+    plein = counts != 0
+
+    # Grille des couleurs LDraw (-1 hors des voxels pleins)
+    couleurs = np.full(counts.shape, -1, dtype=np.int32)
+    if visualisation == "COULEUR" and class_maj is not None:
+        couleurs[plein] = couleurs_lego(class_maj[plein])
+    else:
+        couleurs[plein] = DEFAULT_GRAY
+
+    # Couches paires (H) : lignes selon X, vue (z, y, x) ; couches impaires (V) : lignes selon Y, vue (z, x, y)
+    kz, y_h, x_h, len_h = _runs_lignes(couleurs[:, :, 0::2].transpose(2, 0, 1))
+    col_h = couleurs[y_h, x_h, 2 * kz]
+    layer_h = 2 * kz
+    kz, x_v, y_v, len_v = _runs_lignes(couleurs[:, :, 1::2].transpose(2, 1, 0))
+    col_v = couleurs[y_v, x_v, 2 * kz + 1]
+    layer_v = 2 * kz + 1
 
+    layer = np.concatenate((layer_h, layer_v))
+    order = np.argsort(layer, kind="stable")
+    colonnes = (layer, np.concatenate((x_h, x_v)), np.concatenate((y_h, y_v)), np.concatenate((len_h, len_v)))
+    layer, x, y, total_len = (c[order].astype(np.int32) for c in colonnes)
+    return layer, x, y, total_len, np.ones(len(layer), dtype=np.int32), np.concatenate((col_h, col_v))[order]
 
 
 if __name__ == "__main__":
@@ -167,8 +301,10 @@ if __name__ == "__main__":
     
     # Exportation LDraw (simulation fichiers)
     print("Génération des instructions LDraw (simulation fichiers)...")
-    ldraw_sans_class = voxel_LDRAW(counts, nom_fichier=OUTPUT_DIR/"test_factory_gris.ldr")
-    ldraw_class = voxel_LDRAW_classif(counts, class_maj, nom_fichier=OUTPUT_DIR/"test_factory_color.ldr")
+    voxel_LDRAW(counts, nom_fichier=OUTPUT_DIR/"test_factory_gris.ldr")
+    voxel_LDRAW_classif(counts, class_maj, nom_fichier=OUTPUT_DIR/"test_factory_color.ldr")
+    with open(OUTPUT_DIR/"test_factory_color.ldr") as f:
+        ldraw_class = f.readlines()
     
     nb_voxels = np.count_nonzero(counts)
     print(f"Données voxelisées : {nb_voxels} voxels pleins.")
@@ -221,7 +357,7 @@ if __name__ == "__main__":
     print("TEST C : Conversion Fichier LDraw -> Briques (Parsing)")
     print("   Utilisation des données générées par voxel_LDRAW_classif...")
     
-    # On utilise les lignes générées à l'étape 1 (ldraw_class)
+    # On utilise les lignes du fichier généré à l'étape 1 (ldraw_class)
     briques_parsed = bricks_from_ldr(ldraw_class)
 
     print(f"   Briques parsées : {len(briques_parsed)}")
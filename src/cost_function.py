@@ -4,6 +4,9 @@ Fonctions de coût pour évaluer la solidité d'un assemblage LEGO.
 Optimisé via Hash Map (Grille spatiale) pour une complexité O(N).
 """
 
+import numpy as np
+from merge import as_brick_array
+
 def build_grid_map(bricks):
     """
     Crée un dictionnaire spatial pour accès O(1).
@@ -167,6 +170,129 @@ def horizontal_alignment_penalty_fast(layer_bricks, grid, current_z):
 #   COST FUNCTION — TOTAL COST (Fonction Principale)
 # ============================================================
 
+def build_id_grid(ba):
+    """
+    Version tableau de build_grid_map : grille dense (couche, x, y) -> indice de brique (-1 si vide).
+
+    La grille a une marge d'une case autour des briques (et une couche vide dessous),
+    de sorte que les voisins x-1, x2, y-1, y2 et la couche z-1 sont toujours indexables.
+    Retourne la grille et les décalages (z0, x0, y0) à soustraire aux coordonnées.
+    """
+    z0 = int(ba.layer.min()) - 1
+    x0 = int(ba.x.min()) - 1
+    y0 = int(ba.y.min()) - 1
+    shape = (int(ba.layer.max()) - z0 + 1,
+             int((ba.x + ba.length).max()) - x0 + 1,
+             int((ba.y + ba.width).max()) - y0 + 1)
+    # Indices sur 16 bits quand le nombre de briques le permet (moitié moins de mémoire parcourue)
+    dtype = np.int16 if len(ba) <= np.iinfo(np.int16).max else np.int32
+    grid = np.full(shape, -1, dtype=dtype)
+
+    # Cases couvertes par chaque brique (dx dans [0, length), dy dans [0, width))
+    area = ba.length.astype(np.int64) * ba.width
+    owner = np.repeat(np.arange(len(ba)), area)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(area) - area, area)
+    w = ba.width[owner]
+    cx = ba.x[owner] + k // w
+    cy = ba.y[owner] + k % w
+    grid[ba.layer[owner] - z0, cx - x0, cy - y0] = owner
+
+    return grid, (z0, x0, y0), (owner, cx, cy)
+
+
+def bbox_arrays(ba, origin):
+    """
+    Version tableau de Brick.bbox() : colonnes (x1, y1, x2, y2) de toutes les briques, dans le repère
+    de la grille dense (décalages `origin` soustraits), calculées une seule fois par évaluation.
+    """
+    _, x0, y0 = origin
+    x1, y1 = ba.x - x0, ba.y - y0
+    return x1, y1, x1 + ba.length, y1 + ba.width
+
+
+def perpendicularity_penalty_grid(ba, grid, origin, cells):
+    """
+    Version tableau de perpendicularity_penalty_fast, sur toutes les couches à la fois.
+
+    Chaque case de chaque brique lit la brique juste dessous dans la grille dense ; seules les
+    cases dont les deux briques ont la même orientation sont gardées, puis les paires
+    (brique, brique dessous) dédoublonnées par np.unique sur un code entier (au lieu d'un
+    ensemble de paires d'identifiants).
+    """
+    z0, x0, y0 = origin
+    owner, cx, cy = cells
+    below = grid[ba.layer[owner] - z0 - 1, cx - x0, cy - y0]
+    has_below = below >= 0
+    top, below = owner[has_below], below[has_below]
+    same = ba.orientation[top] == ba.orientation[below]
+    return np.unique(top[same].astype(np.int64) * len(ba) + below[same]).size
+
+
+def vertical_boundary_penalty_grid(ba, grid, origin, bbox):
+    """
+    Version tableau de vertical_boundary_penalty_fast, sur toutes les couches à la fois.
+
+    Bords gauche/droit (x1, x2) pour H, bords bas/haut (y1, y2) pour V : la direction du bord
+    est un pas (dx, dy) par brique, d'où une seule lecture de la grille par case examinée
+    (quatre en tout) au lieu de calculer les deux orientations puis de choisir.
+    """
+    z0 = origin[0]
+    zs = ba.layer - z0 - 1
+    x1, y1 = bbox[0], bbox[1]
+    dx = (ba.orientation == 0).astype(np.int32)
+    dy = 1 - dx
+    span = np.where(dx == 1, ba.length, ba.width)
+
+    in1 = grid[zs, x1, y1]
+    out1 = grid[zs, x1 - dx, y1 - dy]
+    in2 = grid[zs, x1 + dx * (span - 1), y1 + dy * (span - 1)]
+    out2 = grid[zs, x1 + dx * span, y1 + dy * span]
+    return np.count_nonzero(in1 != out1) + np.count_nonzero(in2 != out2)
+
+
+def horizontal_alignment_penalty_grid(ba, grid, origin, bbox):
+    """
+    Version tableau de horizontal_alignment_penalty_fast, sur toutes les couches à la fois.
+
+    Les cases voisines le long des grands côtés sont lues dans la grille dense, les paires
+    (brique, voisin) dédoublonnées par np.unique, puis chaque bord de voisin tombant strictement
+    à l'intérieur de la brique pénalisé selon sa distance au centre.
+    """
+    z0, x0, y0 = origin
+    x1, y1, x2, y2 = bbox
+    z = ba.layer - z0
+    horiz = ba.orientation == 0
+
+    span = np.where(horiz, ba.length, ba.width).astype(np.int64)
+    b_idx = np.repeat(np.arange(len(ba)), span)
+    k = np.arange(len(b_idx)) - np.repeat(np.cumsum(span) - span, span)
+    h = horiz[b_idx]
+    # Côté 1 : y1-1 (H) ou x1-1 (V) ; côté 2 : y2 (H) ou x2 (V)
+    along_x = np.where(h, x1[b_idx] + k, x1[b_idx] - 1)
+    along_y = np.where(h, y1[b_idx] - 1, y1[b_idx] + k)
+    other_x = np.where(h, along_x, x2[b_idx])
+    other_y = np.where(h, y2[b_idx], along_y)
+    zb = z[b_idx]
+    neigh = np.concatenate((grid[zb, along_x, along_y], grid[zb, other_x, other_y]))
+    b_all = np.concatenate((b_idx, b_idx))
+    found = neigh >= 0
+    pairs = np.unique(b_all[found] * len(ba) + neigh[found])
+    b, n = pairs // len(ba), pairs % len(ba)
+
+    hb = horiz[b]
+    lo = np.where(hb, x1[b], y1[b])
+    hi = np.where(hb, x2[b], y2[b])
+    center = (lo + hi) / 2.0
+    half = (hi - lo) / 2.0
+    n_lo = np.where(hb, ba.x[n] - x0, ba.y[n] - y0)
+    n_hi = n_lo + np.where(hb, ba.length[n], ba.width[n])
+    terms = np.concatenate((
+        np.where((lo < n_lo) & (n_lo < hi), np.abs(n_lo - center) / half, 0.0),
+        np.where((lo < n_hi) & (n_hi < hi), np.abs(n_hi - center) / half, 0.0),
+    ))
+    return terms.sum()
+
+
 def total_cost_function(bricks, C1=1.0, C2=1.0, C3=1.0):
     """
     Calcule le coût TOTAL du modèle LEGO.
@@ -175,36 +301,27 @@ def total_cost_function(bricks, C1=1.0, C2=1.0, C3=1.0):
     C1 : Poids Perpendicularité (Croisement)
     C2 : Poids Joints Verticaux (Coups de sabre)
     C3 : Poids Jonctions T
+
+    bricks : liste de Brick ou BrickArray (converti une seule fois).
+
+    Même résultat que les fonctions *_penalty_fast, mais calculé en bloc sur des colonnes
+    NumPy et une grille dense d'indices de briques, sans boucle Python par brique.
     """
-    if not bricks:
+    ba = as_brick_array(bricks)
+    if len(ba) == 0:
         return 0.0
 
-    # 1. Construction de la carte spatiale (O(N))
-    grid = build_grid_map(bricks)
-    
-    # 2. Organisation par couches
-    from collections import defaultdict
-    layers = defaultdict(list)
-    for b in bricks:
-        layers[b.layer].append(b)
+    # 1. Carte spatiale dense et boîtes englobantes (une seule fois pour les trois pénalités)
+    grid, origin, cells = build_id_grid(ba)
+    bbox = bbox_arrays(ba, origin)
 
-    total_cost = 0.0
-    sorted_layers = sorted(layers.keys())
-    
-    for layer_idx in sorted_layers:
-        current_bricks = layers[layer_idx]
-        
-        # P1 & P2 nécessitent une couche en dessous. 
-        if (layer_idx - 1) in layers:
-            P1 = perpendicularity_penalty_fast(current_bricks, grid, layer_idx)
-            P2 = vertical_boundary_penalty_fast(current_bricks, grid, layer_idx)
-        else:
-            P1 = 0
-            P2 = 0
-            
-        # P3 ne dépend que de la couche courante
-        P3 = horizontal_alignment_penalty_fast(current_bricks, grid, layer_idx)
+    # 2. P1 : paires distinctes (brique, brique dessous) de même orientation
+    P1 = perpendicularity_penalty_grid(ba, grid, origin, cells)
+
+    # 3. P2 : joints alignés avec un changement de brique dans la couche dessous
+    P2 = vertical_boundary_penalty_grid(ba, grid, origin, bbox)
 
-        total_cost += (C1 * P1) + (C2 * P2) + (C3 * P3)
+    # 4. P3 : jonctions en T avec les voisins distincts le long des grands côtés
+    P3 = horizontal_alignment_penalty_grid(ba, grid, origin, bbox)
 
-    return total_cost
\ No newline at end of file
+    return float(C1 * P1 + C2 * P2 + C3 * P3)
@@ -25,11 +25,62 @@ DATA_DIR = BASE_DIR / "data"
 sys.path.append(str(SRC_DIR))
 
 # --- Imports des modules du projet ---
-from import_LIDAR import laz_to_las
+from import_LIDAR import laz_to_las, laz_blocs
+from LIDAR_numpy import NuagePoints
+
+
+# Nombre de points décompressés à la fois lors de la lecture en flux
+TAILLE_BLOC_LECTURE = 2_000_000
+
+# Générateur aléatoire du module (tirage sans remise sans permutation complète des indices)
+RNG = np.random.default_rng()
 
 
 # === Fonction principale ===
 
+def lire_zone_LIDAR(file_path, x_min, x_max, y_min, y_max, taille_bloc=TAILLE_BLOC_LECTURE):
+    """
+    Lit un fichier LiDAR en flux et ne conserve que les points situés dans un rectangle.
+
+    Le fichier est décompressé par blocs de `taille_bloc` points : la mémoire utilisée dépend
+    de la taille d'un bloc et du nombre de points retenus, pas de la taille du fichier.
+
+    Paramètres
+    ----------
+    file_path : str
+        Chemin d’accès au fichier LiDAR.
+    x_min, x_max, y_min, y_max : float
+        Bornes (incluses) du rectangle.
+    taille_bloc : int, optional
+        Nombre de points lus à la fois.
+
+    Retour
+    ------
+    X, Y, Z : np.ndarray (int32)
+        Coordonnées entières brutes des points retenus (coordonnée réelle = X * scale + offset).
+    classification : np.ndarray
+        Classification des points retenus, dans l'ordre du fichier.
+    scale, offset : np.ndarray
+        Échelle et décalage des coordonnées du fichier.
+    """
+
+    morceaux = []
+    scale, offset = np.ones(3), np.zeros(3)
+    for bloc in laz_blocs(file_path, taille_bloc):
+        scale, offset = bloc.scales, bloc.offsets
+        x = np.asarray(bloc.x)
+        y = np.asarray(bloc.y)
+        masque = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        if masque.any():
+            morceaux.append(tuple(np.asarray(bloc[attr])[masque] for attr in ("X", "Y", "Z", "classification")))
+
+    if not morceaux:
+        vide = np.empty(0, dtype=np.int32)
+        return vide, vide, vide, np.empty(0, dtype=np.uint8), scale, offset
+    return (*(np.concatenate(attribut) for attribut in zip(*morceaux)), scale, offset)
+
+
+
 def LIDAR_carre_aleatoire(file_path, nb_points, taille_zone):
     """
     Génère un échantillon d'une zone aléatoire sous forme de tableau NumPy à partir d’un fichier LiDAR.
@@ -45,11 +96,11 @@ def LIDAR_carre_aleatoire(file_path, nb_points, taille_zone):
 
     Retour
     ------
-    LIDAR_numpy_test : np.ndarray
-        Tableau NumPy structuré contenant les champs :
-        - 'x' : coordonnées X (float64)
-        - 'y' : coordonnées Y (float64)
-        - 'z' : altitude Z (float64)
+    LIDAR_numpy_test : NuagePoints
+        Nuage de points en colonnes contiguës :
+        - 'x' : coordonnées X (int32, relatives à l'origine, en unités d'échelle)
+        - 'y' : coordonnées Y (int32, relatives à l'origine, en unités d'échelle)
+        - 'z' : altitude Z (int32, relative à l'origine, en unités d'échelle)
         - 'classification' : code de classification LiDAR (uint8)
 
     """
@@ -57,44 +108,32 @@ def LIDAR_carre_aleatoire(file_path, nb_points, taille_zone):
     # Lecture du fichier LiDAR
     las = laz_to_las(file_path)
 
-    # Extraction des attributs du fichier LIDAR
+    # Extraction des attributs du fichier LIDAR (coordonnées réelles pour la sélection, entières pour le nuage)
     x = las.x
     y = las.y
-    z = las.z
     classification = las.classification
 
-    # Sélection d’une zone carrée aléatoire 
-    xmin, xmax = np.min(x), np.max(x)
-    ymin, ymax = np.min(y), np.max(y)
+    # Sélection d’une zone carrée aléatoire (emprise lue dans l'en-tête : aucun parcours des points)
+    xmin, ymin, _ = las.header.mins
+    xmax, ymax, _ = las.header.maxs
 
-    x0 = np.random.uniform(xmin, xmax - taille_zone)
-    y0 = np.random.uniform(ymin, ymax - taille_zone)
+    x0 = RNG.uniform(xmin, xmax - taille_zone)
+    y0 = RNG.uniform(ymin, ymax - taille_zone)
 
     # Points dans la zone
     masque_zone = (x >= x0) & (x <= x0 + taille_zone) & (y >= y0) & (y <= y0 + taille_zone)
-    indices_zone = np.where(masque_zone)[0]
-
-    # Si trop de points, on échantillonne
-    if len(indices_zone) > nb_points:
-        indices_zone = np.random.choice(indices_zone, size=nb_points, replace=False)
-
-    # Données finales
-    x_final = x[indices_zone]
-    y_final = y[indices_zone]
-    z_final = z[indices_zone]
-    classification_final = classification[indices_zone]
-
-    # Construction du tableau Numpy 
-    LIDAR_numpy_test = np.zeros(len(indices_zone), dtype=[
-        ('x', np.float64),
-        ('y', np.float64),
-        ('z', np.float64),
-        ('classification', np.uint8)
-    ])
-    LIDAR_numpy_test['x'] = x_final
-    LIDAR_numpy_test['y'] = y_final
-    LIDAR_numpy_test['z'] = z_final
-    LIDAR_numpy_test['classification'] = classification_final
+
+    # Le masque sert directement d'index (une seule passe par colonne) ; si trop de points, on échantillonne
+    indices_zone = masque_zone
+    if np.count_nonzero(masque_zone) > nb_points:
+        indices_zone = np.flatnonzero(masque_zone)
+        indices_zone = indices_zone[RNG.choice(indices_zone.size, size=nb_points, replace=False, shuffle=False)]
+
+    # Construction du nuage de points (colonnes contiguës, coordonnées entières brutes)
+    LIDAR_numpy_test = NuagePoints.depuis_LAS(
+        np.asarray(las.X)[indices_zone], np.asarray(las.Y)[indices_zone], np.asarray(las.Z)[indices_zone],
+        np.asarray(classification)[indices_zone], las.header.scale, las.header.offset
+    )
 
     return LIDAR_numpy_test
 
@@ -122,56 +161,30 @@ def LIDAR_rectangle(file_path, nb_points, x_min_coin, y_min_coin, longueur_x, lo
 
     Retour
     ------
-    LIDAR_numpy_test : np.ndarray
-        Tableau NumPy structuré contenant les champs :
-        - 'x' : coordonnées X (float64)
-        - 'y' : coordonnées Y (float64)
-        - 'z' : altitude Z (float64)
+    LIDAR_numpy_test : NuagePoints
+        Nuage de points en colonnes contiguës :
+        - 'x' : coordonnées X (int32, relatives à l'origine, en unités d'échelle)
+        - 'y' : coordonnées Y (int32, relatives à l'origine, en unités d'échelle)
+        - 'z' : altitude Z (int32, relative à l'origine, en unités d'échelle)
         - 'classification' : code de classification LiDAR (uint8)
     """
 
-    # === Lecture du fichier LiDAR ===
-    las = laz_to_las(file_path)
-
-    # === Extraction des attributs ===
-    x = las.x
-    y = las.y
-    z = las.z
-    classification = las.classification
-
-    # === Bornes globales ===
-    xmin, xmax = np.min(x), np.max(x)
-    ymin, ymax = np.min(y), np.max(y)
-
     # === Définition du rectangle ===
     x_max_coin = x_min_coin + longueur_x
     y_max_coin = y_min_coin + longueur_y
 
-    # === Filtrage vectorisé des points dans le rectangle ===
-    masque_zone = ((x >= x_min_coin) & (x <= x_max_coin) & (y >= y_min_coin) & (y <= y_max_coin))
-    indices_zone = np.where(masque_zone)[0]
+    # === Lecture en flux et filtrage vectorisé des points dans le rectangle, bloc par bloc ===
+    X, Y, Z, classification, scale, offset = lire_zone_LIDAR(file_path, x_min_coin, x_max_coin, y_min_coin, y_max_coin)
+    indices_zone = slice(None)
 
     # === Échantillonnage si trop de points ===
-    if len(indices_zone) > nb_points:
-        indices_zone = np.random.choice(indices_zone, size=nb_points, replace=False)
-
-    # === Données finales ===
-    x_final = x[indices_zone]
-    y_final = y[indices_zone]
-    z_final = z[indices_zone]
-    classification_final = classification[indices_zone]
-
-    # === Construction du tableau NumPy structuré ===
-    LIDAR_numpy_test = np.zeros(len(indices_zone), dtype=[
-        ('x', np.float64),
-        ('y', np.float64),
-        ('z', np.float64),
-        ('classification', np.uint8)
-    ])
-    LIDAR_numpy_test['x'] = x_final
-    LIDAR_numpy_test['y'] = y_final
-    LIDAR_numpy_test['z'] = z_final
-    LIDAR_numpy_test['classification'] = classification_final
+    if len(X) > nb_points:
+        indices_zone = RNG.choice(len(X), size=nb_points, replace=False, shuffle=False)
+
+    # === Construction du nuage de points (colonnes contiguës, coordonnées entières brutes) ===
+    LIDAR_numpy_test = NuagePoints.depuis_LAS(
+        X[indices_zone], Y[indices_zone], Z[indices_zone], classification[indices_zone], scale, offset
+    )
 
     return LIDAR_numpy_test
 
@@ -2,23 +2,77 @@
 === Importer un fichier .laz en .las ===
 
 Ce code permet de :
-- Convertir un fichier .laz en .las.
+- Convertir un fichier .laz en .las (mis en cache sur disque à côté du .laz).
+- Lire un fichier .laz en flux, par blocs de points.
 
 """
 
 # === Importations ===
 
+from pathlib import Path
+
 import laspy
 
 
+# Décodeurs LAZ par ordre de préférence : laspy prend le premier disponible.
+# lazrs en parallèle décompresse les blocs de points sur tous les cœurs.
+BACKENDS_LAZ = (
+    laspy.LazBackend.LazrsParallel,
+    laspy.LazBackend.Lazrs,
+    laspy.LazBackend.Laszip,
+)
+
 
 # === Fonction principale ===
 
-def laz_to_las(file_path):
-    """Retourne le fichier .laz dézippé en .las"""
+def chemin_cache_las(file_path):
+    """Chemin du .las décompressé mis en cache à côté du .laz source."""
+
+    file_path = Path(file_path)
+    return file_path.with_name(f"{file_path.stem}.cache.las")
+
+
+def laz_to_las(file_path, cache=True):
+    """
+    Retourne le fichier .laz dézippé en .las
+
+    Le .las décompressé est écrit à côté du .laz (`<nom>.cache.las`) et relu tel quel
+    tant qu'il est plus récent que le .laz : les exécutions suivantes ne décompressent plus.
+    """
+
+    file_path = Path(file_path)
+    if not cache or file_path.suffix.lower() != ".laz":
+        return laspy.read(str(file_path), laz_backend=BACKENDS_LAZ)
+
+    # Cache valide : lecture directe du .las non compressé
+    chemin_cache = chemin_cache_las(file_path)
+    if chemin_cache.exists() and chemin_cache.stat().st_mtime >= file_path.stat().st_mtime:
+        return laspy.read(str(chemin_cache))
 
     # Lecture du fichier LiDAR
-    las = laspy.read(str(file_path), laz_backend=laspy.LazBackend.Laszip)
+    las = laspy.read(str(file_path), laz_backend=BACKENDS_LAZ)
+
+    # Écriture du cache via un fichier temporaire (un cache tronqué ne doit jamais être relu),
+    # ignorée si le dossier n'est pas accessible en écriture
+    chemin_tmp = chemin_cache.with_name(chemin_cache.name + ".tmp")
+    try:
+        las.write(str(chemin_tmp), do_compress=False)
+        chemin_tmp.replace(chemin_cache)
+    except OSError:
+        chemin_tmp.unlink(missing_ok=True)
 
     return las
-    
\ No newline at end of file
+    
+
+
+
+def laz_blocs(file_path, taille_bloc=2_000_000):
+    """
+    Lit le fichier .laz en flux et renvoie ses points par blocs de `taille_bloc` points.
+
+    Seul un bloc décompressé est en mémoire à la fois (contrairement à laz_to_las).
+    """
+
+    with laspy.open(str(file_path), laz_backend=BACKENDS_LAZ) as lecteur:
+        for bloc in lecteur.chunk_iterator(taille_bloc):
+            yield bloc
@@ -4,6 +4,11 @@ Gestion des briques LEGO : Définition, Fusion et Contraintes physiques.
 Ce module définit la classe Brick et les règles permettant de fusionner deux briques 1x1.
 """
 
+from collections import defaultdict
+from dataclasses import dataclass
+from operator import attrgetter
+import numpy as np
+
 # Catalogue simplifié des briques standard (Largeur, Longueur)
 # Il faut que ca corresponde au catalogue de pièces LDraw dans solver.py
 VALID_SIZES = {
@@ -18,7 +23,50 @@ VALID_SIZES = {
     (4, 2)
 }
 
+def catalogue_max_size(sizes):
+    """Plus grand côté (en tenons) d'un catalogue : fixe la disposition des bits du masque."""
+    return max((max(length, width) for (length, width) in sizes), default=1)
+
+def build_valid_mask(sizes, max_size=None):
+    """
+    Encode un catalogue de tailles (longueur, largeur) dans un entier bitmask.
+    Le bit d'index (longueur-1)*max_size + (largeur-1) vaut 1 si la taille existe ;
+    max_size vaut par défaut le plus grand côté du catalogue (un int Python n'a pas de limite de bits).
+    """
+    if max_size is None:
+        max_size = catalogue_max_size(sizes)
+    mask = 0
+    for (length, width) in sizes:
+        if not (1 <= length <= max_size and 1 <= width <= max_size):
+            raise ValueError(f"Taille de brique hors limites (1 à {max_size}) : {length}x{width}")
+        mask |= 1 << ((length - 1) * max_size + (width - 1))
+    return mask
+
+def build_valid_table(sizes, max_size):
+    """Même catalogue en tableau booléen (max_size+1)² indexé par [longueur, largeur], pour les tests vectorisés."""
+    table = np.zeros((max_size + 1, max_size + 1), dtype=bool)
+    for (length, width) in sizes:
+        table[length, width] = True
+    return table
+
+# Dimension maximale (en tenons) d'un côté de brique encodable dans le masque, suivant le catalogue actif
+MAX_SIZE = catalogue_max_size(VALID_SIZES)
+VALID_MASK = build_valid_mask(VALID_SIZES, MAX_SIZE)
+VALID_TABLE = build_valid_table(VALID_SIZES, MAX_SIZE)
+
+def set_valid_sizes(sizes):
+    """Remplace le catalogue actif (ensemble + bitmask + table) par l'inventaire fourni."""
+    global VALID_SIZES, VALID_MASK, VALID_TABLE, MAX_SIZE
+    max_size = catalogue_max_size(sizes)
+    VALID_MASK = build_valid_mask(sizes, max_size)
+    VALID_TABLE = build_valid_table(sizes, max_size)
+    MAX_SIZE = max_size
+    VALID_SIZES = set(sizes)
+
 class Brick:
+    # Attributs fixes : pas de __dict__ par instance (les listes de briques en comptent des centaines de milliers)
+    __slots__ = ("layer", "x", "y", "length", "width", "color", "orientation")
+
     def __init__(self, layer, x, y, length, width, color, orientation="H"):
         """
         Représente une brique LEGO.
@@ -57,6 +105,59 @@ class Brick:
         return f"Brick(L{self.layer}, x={self.x}, y={self.y}, {self.length}x{self.width}, col={self.color}, ori={self.orientation})"
 
 
+# Codage de l'orientation dans BrickArray
+ORIENTATIONS = ("H", "V")
+
+@dataclass
+class BrickArray:
+    """
+    Ensemble de briques en colonnes NumPy parallèles (Structure of Arrays).
+
+    Une brique occupe une ligne dans chaque colonne int32 (layer, x, y, length, width, color) ;
+    orientation vaut 0 ("H") ou 1 ("V"). Environ 25 octets par brique, contre un objet Python complet pour Brick.
+    """
+    layer: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    length: np.ndarray
+    width: np.ndarray
+    color: np.ndarray
+    orientation: np.ndarray
+
+    def __len__(self):
+        return len(self.layer)
+
+    @classmethod
+    def from_bricks(cls, bricks):
+        """Convertit une liste de Brick en BrickArray (une colonne par attribut, lue par np.fromiter)."""
+        n = len(bricks)
+        cols = [np.fromiter(map(attrgetter(name), bricks), dtype=np.int32, count=n)
+                for name in ("layer", "x", "y", "length", "width", "color")]
+        orientation = np.array([ORIENTATIONS.index(o) for o in map(attrgetter("orientation"), bricks)], dtype=np.uint8)
+        return cls(*cols, orientation)
+
+    def to_bricks(self):
+        """Vue objet : reconstruit la liste de Brick pour le code qui en a besoin."""
+        return [
+            Brick(layer, x, y, length, width, color, ORIENTATIONS[o])
+            for layer, x, y, length, width, color, o in zip(
+                self.layer.tolist(), self.x.tolist(), self.y.tolist(), self.length.tolist(),
+                self.width.tolist(), self.color.tolist(), self.orientation.tolist())
+        ]
+
+def as_brick_array(bricks):
+    """Retourne un BrickArray, en convertissant une seule fois si l'entrée est une liste de Brick."""
+    if isinstance(bricks, BrickArray):
+        return bricks
+    return BrickArray.from_bricks(bricks)
+
+def as_brick_list(bricks):
+    """Retourne une liste de Brick, en convertissant une seule fois si l'entrée est un BrickArray."""
+    if isinstance(bricks, BrickArray):
+        return bricks.to_bricks()
+    return bricks
+
+
 # =======================================================
 #          Fonctions de Validation & Voisinage
 # =======================================================
@@ -65,8 +166,20 @@ def is_valid_lego_part(length, width):
     """
     Vérifie si la brique existe dans le catalogue LEGO physique.
     Ex: 1x4 existe, mais 1x5 n'existe pas.
+    Test d'un bit dans VALID_MASK (pas de tuple ni de hachage).
+    """
+    if length < 1 or width < 1 or length > MAX_SIZE or width > MAX_SIZE:
+        return False
+    return (VALID_MASK >> ((length - 1) * MAX_SIZE + (width - 1))) & 1 == 1
+
+def valid_parts_mask(length, width):
     """
-    return (length, width) in VALID_SIZES
+    Version vectorisée de is_valid_lego_part : tableau booléen, une lecture de VALID_TABLE par brique.
+    """
+    length = np.asarray(length, dtype=np.int64)
+    width = np.asarray(width, dtype=np.int64)
+    in_bounds = (length >= 1) & (width >= 1) & (length <= MAX_SIZE) & (width <= MAX_SIZE)
+    return in_bounds & VALID_TABLE[np.where(in_bounds, length, 0), np.where(in_bounds, width, 0)]
 
 def are_neighbors(b1, b2):
     """
@@ -99,16 +212,19 @@ def are_neighbors(b1, b2):
 
 # --- FUSION LONGITUDINALE (1D) ---
 def can_merge(b1, b2):
-    """Fusion bout à bout (Allongement)."""
+    """
+    Fusion bout à bout (Allongement).
+    L'alignement (même ligne, même épaisseur) réduit le test de voisinage à un contact bout à bout.
+    """
     if b1.layer != b2.layer or b1.color != b2.color or b1.orientation != b2.orientation:
         return False
-    if not are_neighbors(b1, b2):
-        return False
 
     if b1.orientation == "H": 
-        return (b1.y == b2.y) and (b1.width == b2.width)
+        return (b1.y == b2.y and b1.width == b2.width
+                and (b1.x + b1.length == b2.x or b2.x + b2.length == b1.x))
     if b1.orientation == "V":
-        return (b1.x == b2.x) and (b1.length == b2.length)
+        return (b1.x == b2.x and b1.length == b2.length
+                and (b1.y + b1.width == b2.y or b2.y + b2.width == b1.y))
     return False
 
 def merge_bricks(b1, b2):
@@ -133,17 +249,17 @@ def can_merge_side(b1, b2):
     """
     Fusion côte à côte (Élargissement).
     Exemple : Deux 1x4 côte à côte deviennent une 2x4.
+    L'alignement (même départ, même longueur) réduit le test de voisinage à un contact des flancs.
     """
     if b1.layer != b2.layer or b1.color != b2.color or b1.orientation != b2.orientation:
         return False
-    
-    if not are_neighbors(b1, b2):
-        return False
 
     if b1.orientation == "H":
-        return (b1.x == b2.x) and (b1.length == b2.length)
+        return (b1.x == b2.x and b1.length == b2.length
+                and (b1.y + b1.width == b2.y or b2.y + b2.width == b1.y))
     elif b1.orientation == "V":
-        return (b1.y == b2.y) and (b1.width == b2.width)
+        return (b1.y == b2.y and b1.width == b2.width
+                and (b1.x + b1.length == b2.x or b2.x + b2.length == b1.x))
     return False
 
 def merge_bricks_side(b1, b2):
@@ -164,16 +280,82 @@ def merge_bricks_side(b1, b2):
             
     return None
 
+# --- PRÉDICATS VECTORISÉS (paires de briques d'un BrickArray) ---
+def _pair_columns(ba, i, j):
+    """
+    Colonnes des deux briques de chaque paire, exprimées selon l'orientation de la première :
+    (même couche/couleur/orientation, principal a/b, dim principale a/b, transverse a/b, dim transverse a/b).
+    `i` et `j` sont des tableaux d'indices ou des slices de même longueur.
+    """
+    h = ba.orientation[i] == 0
+    same = (ba.layer[i] == ba.layer[j]) & (ba.color[i] == ba.color[j]) & (ba.orientation[i] == ba.orientation[j])
+    main_a, main_b = np.where(h, ba.x[i], ba.y[i]), np.where(h, ba.x[j], ba.y[j])
+    dmain_a, dmain_b = np.where(h, ba.length[i], ba.width[i]), np.where(h, ba.length[j], ba.width[j])
+    cross_a, cross_b = np.where(h, ba.y[i], ba.x[i]), np.where(h, ba.y[j], ba.x[j])
+    dcross_a, dcross_b = np.where(h, ba.width[i], ba.length[i]), np.where(h, ba.width[j], ba.length[j])
+    return same, main_a, main_b, dmain_a, dmain_b, cross_a, cross_b, dcross_a, dcross_b
+
+def can_merge_pairs(ba, i, j):
+    """
+    Version vectorisée de can_merge sur les paires (ba[i], ba[j]) : un masque booléen, sans branchement par paire.
+    Même ligne transverse et même épaisseur, bouts qui se touchent sur l'axe principal.
+    """
+    same, main_a, main_b, dmain_a, dmain_b, cross_a, cross_b, dcross_a, dcross_b = _pair_columns(ba, i, j)
+    return (same & (cross_a == cross_b) & (dcross_a == dcross_b)
+            & ((main_a + dmain_a == main_b) | (main_b + dmain_b == main_a)))
+
+def can_merge_side_pairs(ba, i, j):
+    """
+    Version vectorisée de can_merge_side sur les paires (ba[i], ba[j]).
+    Même position et même longueur sur l'axe principal, flancs qui se touchent sur l'axe transverse.
+    """
+    same, main_a, main_b, dmain_a, dmain_b, cross_a, cross_b, dcross_a, dcross_b = _pair_columns(ba, i, j)
+    return (same & (main_a == main_b) & (dmain_a == dmain_b)
+            & ((cross_a + dcross_a == cross_b) | (cross_b + dcross_b == cross_a)))
+
+# Côté (en tenons) d'une case de la grille spatiale : longueur maximale d'une brique du catalogue
+GRID_CELL = 4
+
+@dataclass
+class GridIndex:
+    """
+    Grille spatiale des briques : cells[(layer, cx, cy)] liste les briques dont la bbox recouvre la case.
+    Chaque case couvre `cell` x `cell` tenons.
+    """
+    cell: int
+    cells: dict
+
+def build_grid_index(bricks, cell=GRID_CELL):
+    """Range chaque brique dans toutes les cases de `cell` tenons que recouvre sa bounding box."""
+    cells = defaultdict(list)
+    for b in bricks:
+        for cx in range(b.x // cell, (b.x + b.length - 1) // cell + 1):
+            for cy in range(b.y // cell, (b.y + b.width - 1) // cell + 1):
+                cells[(b.layer, cx, cy)].append(b)
+    return GridIndex(cell, cells)
+
 def get_neighbors(brick, bricks):
     """
-    Retourne tous les voisins mergeables d’une brique donnée dans une liste.
-    Note : Cette fonction est linéaire O(N), pour l'optimisation on préférera
-    passer par une grille spatiale (voir cost_func_change.py).
+    Retourne tous les voisins mergeables d’une brique donnée.
+
+    `bricks` est une liste (parcours linéaire O(N)) ou un GridIndex (build_grid_index) :
+    seules les cases touchant la bounding box de la brique, élargie d'un tenon, sont alors examinées.
     """
+    if isinstance(bricks, GridIndex):
+        cell, cells = bricks.cell, bricks.cells
+        candidates, seen = [], set()
+        for cx in range((brick.x - 1) // cell, (brick.x + brick.length) // cell + 1):
+            for cy in range((brick.y - 1) // cell, (brick.y + brick.width) // cell + 1):
+                for b in cells.get((brick.layer, cx, cy), ()):
+                    if id(b) not in seen:
+                        seen.add(id(b))
+                        candidates.append(b)
+        bricks = candidates
+
     neigh = []
     for b in bricks:
         if b is brick:
             continue
         if can_merge(brick, b):
             neigh.append(b)
-    return neigh
\ No newline at end of file
+    return neigh
@@ -20,8 +20,7 @@ from LIDAR_couches import LIDAR_couches, LIDAR_couches_LEGO, LIDAR_couches_LEGO_
 from LIDAR_LDRAW import voxel_LDRAW, voxel_LDRAW_classif
 
 import merge
-from merge import Brick, merge_bricks, merge_bricks_side, VALID_SIZES
-from collections import defaultdict, Counter
+from merge import Brick, BrickArray, merge_bricks, VALID_SIZES, as_brick_array
 from cost_function import total_cost_function
 
 
@@ -55,13 +54,17 @@ LEGO_PARTS = {
 def print_brick_stats(bricks):
     """
     Affiche le décompte des briques par type (Inventaire).
+    Accepte une liste de Brick ou un BrickArray : comptage par np.bincount sur les dimensions codées.
     """
-    stats = Counter()
-    
-    for b in bricks:
-        # Normalisation des dimensions (petit x grand) pour que 2x4 et 4x2 soient comptés ensemble
-        dims = tuple(sorted((b.width, b.length)))
-        stats[dims] += 1
+    ba = as_brick_array(bricks)
+
+    # Normalisation des dimensions (petit x grand) pour que 2x4 et 4x2 soient comptés ensemble,
+    # codées en un entier petit * base + grand
+    small = np.minimum(ba.width, ba.length).astype(np.int64)
+    large = np.maximum(ba.width, ba.length).astype(np.int64)
+    base = int(large.max()) + 1 if len(ba) else 1
+    counts = np.bincount(small * base + large)
+    stats = {divmod(code, base): int(counts[code]) for code in np.flatnonzero(counts).tolist()}
         
     print("\n" + "="*40)
     print("      INVENTAIRE FINAL (BOM)      ")
@@ -89,85 +92,115 @@ def print_brick_stats(bricks):
     print("="*40 + "\n")
 
 
+# Matrices de rotation LDraw déjà formatées : [0] alignée sur X, [1] rotation 90° autour de Y (width > length)
+LDR_ROTATIONS = ("1 0 0 0 1 0 0 0 1", "0 0 1 0 1 0 -1 0 0")
+
+def ldr_line_suffix(length, width):
+    """
+    Fin de ligne LDraw (matrice de rotation + pièce) d'une brique de dimensions données.
+
+    Ne dépend que de (length, width) : export_to_ldr la calcule une fois par forme
+    et la réutilise pour toutes les briques de même forme.
+    """
+    part_file = LEGO_PARTS.get((width, length) if width <= length else (length, width))
+
+    if part_file:
+        # Gestion Rotation (LDraw standard aligné sur X ; rotation 90° autour de Y si la brique est verticale)
+        return f" {LDR_ROTATIONS[width > length]} {part_file}\n"
+
+    # Fallback
+    return f" {length} 0 0 0 1 0 0 0 {width} 3005.dat\n"
+
+
+# Nombre de lignes formatées puis écrites à la fois par export_to_ldr
+LDR_BLOC_LIGNES = 100_000
+
 def export_to_ldr(bricks, filename):
-    """Génère le fichier .ldr final avec positionnement corrigé."""
+    """
+    Génère le fichier .ldr final avec positionnement corrigé.
+    Accepte une liste de Brick ou un BrickArray : les positions sont calculées en colonnes NumPy,
+    la fin de ligne (rotation + pièce) une seule fois par forme, puis le fichier est écrit par blocs.
+    """
     header = ["0 Optimized LEGO Model\n", "0 Name: " + str(filename) + "\n", "0 Author: Greedy Solver\n"]
-    lines = []
+    ba = as_brick_array(bricks)
     
-    # Paramètres LDraw
-    LDR_UNIT = 20.0
-    LDR_HEIGHT = 24.0
-
-    for b in bricks:
-        # Coordonnées du coin "Grid" converties en LDraw
-        x_coin = b.x * LDR_UNIT
-        y_coin = b.y * LDR_UNIT
-        z_pos = -b.layer * LDR_HEIGHT 
-
-        # Dimensions réelles de la brique
-        dim_x = b.length * LDR_UNIT
-        dim_y = b.width * LDR_UNIT
-        
-        # Centre géométrique
-        center_x = x_coin + (dim_x / 2.0)
-        center_y = y_coin + (dim_y / 2.0)
-
-        dims_sorted = tuple(sorted((b.width, b.length)))
-        part_file = LEGO_PARTS.get(dims_sorted)
-
-        if part_file:
-            # Gestion Rotation (LDraw standard aligné sur X)
-            a, b_rot, c, d, e, f, g, h, i = 1, 0, 0, 0, 1, 0, 0, 0, 1
-            
-            if b.width > b.length:
-                 # Rotation 90° autour de Y (Vertical)
-                 a, b_rot, c = 0, 0, 1
-                 d, e, f     = 0, 1, 0
-                 g, h, i     = -1, 0, 0
-            
-            line = f"1 {b.color} {center_x:.2f} {z_pos:.2f} {center_y:.2f} {a} {b_rot} {c} {d} {e} {f} {g} {h} {i} {part_file}\n"
-        else:
-            # Fallback
-            mat_a = b.length
-            mat_i = b.width
-            line = f"1 {b.color} {center_x:.2f} {z_pos:.2f} {center_y:.2f} {mat_a} 0 0 0 1 0 0 0 {mat_i} 3005.dat\n"
-
-        lines.append(line)
-
-    with open(filename, "w") as f:
+    # Paramètres LDraw (entiers : avec un LDR_UNIT pair, centres et altitudes tombent sur des LDU entiers)
+    LDR_UNIT = 20
+    LDR_HEIGHT = 24
+
+    # Centre géométrique (coin "Grid" converti en LDraw + demi-dimensions) et altitude, en LDU entiers
+    center_x = ba.x.astype(np.int64) * LDR_UNIT + ba.length * (LDR_UNIT // 2)
+    center_y = ba.y.astype(np.int64) * LDR_UNIT + ba.width * (LDR_UNIT // 2)
+    z_pos = -ba.layer.astype(np.int64) * LDR_HEIGHT
+
+    # Fin de ligne par forme (length, width) distincte, codée sur un entier (length << 32 | width)
+    shapes, shape_idx = np.unique((ba.length.astype(np.int64) << 32) | ba.width, return_inverse=True)
+    suffixes = [ldr_line_suffix(code >> 32, code & 0xFFFFFFFF) for code in shapes.tolist()]
+
+    # Formatage entier + ".00" : même texte que "{:.2f}" sur ces valeurs entières, sans formatage flottant.
+    # Écriture par blocs de LDR_BLOC_LIGNES lignes : le texte complet n'est jamais en mémoire.
+    columns = (ba.color, center_x, z_pos, center_y, shape_idx.reshape(-1))
+    with open(filename, "w", buffering=1 << 20) as f:
         f.writelines(header)
-        f.writelines(lines)
-    print(f"[Export] Fichier généré : {filename} ({len(bricks)} briques)")
-
+        for start in range(0, len(ba), LDR_BLOC_LIGNES):
+            bloc = (col[start:start + LDR_BLOC_LIGNES].tolist() for col in columns)
+            f.write("".join([f"1 {c} {cx}.00 {z}.00 {cy}.00{suffixes[k]}" for c, cx, z, cy, k in zip(*bloc)]))
+    print(f"[Export] Fichier généré : {filename} ({len(ba)} briques)")
+
+
+# Caches des longueurs valides et des tables de partition, propres au catalogue merge.VALID_SIZES courant
+_valid_lengths_cache = {}
+_partition_tables = {}  # width_ref -> liste : table[n] = partition de la longueur n
+_cache_sizes = None
+
+# Longueur jusqu'à laquelle une table de partition est remplie à sa création
+PARTITION_TABLE_SIZE = 1024
+
+def _check_cache():
+    """Vide les caches si le catalogue merge.VALID_SIZES a été remplacé depuis leur construction."""
+    global _cache_sizes
+    if _cache_sizes is not merge.VALID_SIZES:
+        _valid_lengths_cache.clear()
+        _partition_tables.clear()
+        _cache_sizes = merge.VALID_SIZES
+
+def get_valid_lengths(width_ref):
+    """Longueurs disponibles (décroissantes) pour une largeur donnée, calculées une fois par catalogue."""
+    _check_cache()
+    lengths = _valid_lengths_cache.get(width_ref)
+    if lengths is None:
+        valid_lengths = []
+        for (l, w) in merge.VALID_SIZES:
+            if w == width_ref: valid_lengths.append(l)
+            if l == width_ref: valid_lengths.append(w)
+        lengths = tuple(sorted(set(valid_lengths), reverse=True))
+        _valid_lengths_cache[width_ref] = lengths
+    return lengths
+
+def _extend_partition_table(table, valid_lengths, size):
+    """
+    Remplit table[len(table):size + 1].
+    Le découpage glouton ne dépend que du reste : partition(n) = (L,) + partition(n - L),
+    avec L la plus grande longueur valide <= n (1 à défaut). Chaque entrée se déduit d'une entrée déjà calculée.
+    """
+    for n in range(len(table), size + 1):
+        L = next((L for L in valid_lengths if L <= n), 1)
+        table.append((L,) + table[n - L])
 
 def get_best_partition(total_length, width_ref):
     """
     Découpe une longueur totale en segments valides (les plus grands possibles).
     Exemple (Target 7) -> [4, 3] (car 7 n'existe pas, mais 4 et 3 oui).
+    Lecture dans une table précalculée par largeur (PARTITION_TABLE_SIZE longueurs, étendue au besoin).
     """
-    parts = []
-    remaining = total_length
-    
-    valid_lengths = []
-    for (l, w) in merge.VALID_SIZES:
-        if w == width_ref: valid_lengths.append(l)
-        if l == width_ref: valid_lengths.append(w)
-    
-    valid_lengths = sorted(list(set(valid_lengths)), reverse=True)
-    
-    while remaining > 0:
-        found = False
-        for L in valid_lengths:
-            if L <= remaining:
-                parts.append(L)
-                remaining -= L
-                found = True
-                break
-        if not found:
-            parts.append(1)
-            remaining -= 1
-            
-    return parts
+    _check_cache()
+    table = _partition_tables.get(width_ref)
+    if table is None:
+        table = _partition_tables[width_ref] = [()]
+        _extend_partition_table(table, get_valid_lengths(width_ref), PARTITION_TABLE_SIZE)
+    if total_length >= len(table):
+        _extend_partition_table(table, get_valid_lengths(width_ref), total_length)
+    return table[max(total_length, 0)]
 
 def optimize_layer_smart(bricks, orientation):
     """
@@ -175,138 +208,239 @@ def optimize_layer_smart(bricks, orientation):
     1. Identifie les "runs" continus de briques (même couleur, alignées).
     2. Calcule la longueur totale.
     3. Partitionne cette longueur en briques optimales selon VALID_SIZES.
+    Détection et découpage des runs vectorisés (find_runs_array, split_runs_array) : aucune boucle Python par brique.
     """
-    # Tri
-    if orientation == "H":
-        bricks.sort(key=lambda b: (b.y, b.x)) 
-        attr_main = 'x' 
-        attr_cross = 'y' 
-        dim_main = 'length'
-        dim_cross = 'width'
-    else: # V
-        bricks.sort(key=lambda b: (b.x, b.y))
-        attr_main = 'y'
-        attr_cross = 'x'
-        dim_main = 'width' 
-        dim_cross = 'length' 
-
-    optimized = []
-    if not bricks: return []
-
-    current_run = [bricks[0]]
-    
-    for b in bricks[1:]:
-        last = current_run[-1]
-        
-        is_continuous = (
-            getattr(b, attr_cross) == getattr(last, attr_cross) and 
-            b.color == last.color and
-            getattr(b, attr_main) == getattr(last, attr_main) + getattr(last, dim_main)
-        )
-        
-        if is_continuous:
-            current_run.append(b)
-        else:
-            optimized.extend(process_run(current_run, orientation))
-            current_run = [b]
-            
-    optimized.extend(process_run(current_run, orientation))
-    return optimized
+    if not len(bricks): return []
+
+    runs = find_runs_array(as_brick_array(bricks), orientation)
+    return split_runs_array(runs, orientation).to_bricks()
+
+def _process_run_H(run_bricks):
+    """process_run spécialisé "H" : somme des longueurs, largeur de référence = width."""
+    ref_b = run_bricks[0]
+    total_len = sum(b.length for b in run_bricks)
+    return _split_run_H(ref_b.layer, ref_b.x, ref_b.y, total_len, ref_b.width, ref_b.color)
+
+def _process_run_V(run_bricks):
+    """process_run spécialisé "V" : somme des largeurs, largeur de référence = length."""
+    ref_b = run_bricks[0]
+    total_len = sum(b.width for b in run_bricks)
+    return _split_run_V(ref_b.layer, ref_b.x, ref_b.y, total_len, ref_b.length, ref_b.color)
+
+def _split_run_H(layer, x, y, total_len, width_ref, color):
+    """split_run spécialisé "H" : segments successifs selon X."""
+    new_bricks = []
+    curr_x = x
+    for seg_len in get_best_partition(total_len, width_ref):
+        new_bricks.append(Brick(layer, curr_x, y, seg_len, width_ref, color, "H"))
+        curr_x += seg_len
+    return new_bricks
+
+def _split_run_V(layer, x, y, total_len, width_ref, color):
+    """split_run spécialisé "V" : segments successifs selon Y (length=largeur(X), width=longueur(Y))."""
+    new_bricks = []
+    curr_y = y
+    for seg_len in get_best_partition(total_len, width_ref):
+        new_bricks.append(Brick(layer, x, curr_y, width_ref, seg_len, color, "V"))
+        curr_y += seg_len
+    return new_bricks
+
+# Variantes spécialisées, choisies une fois par orientation (aucun test d'orientation par brique)
+_PROCESS_RUN = {"H": _process_run_H, "V": _process_run_V}
+_SPLIT_RUN = {"H": _split_run_H, "V": _split_run_V}
 
 def process_run(run_bricks, orientation):
     """Transforme une suite de briques brutes (ex: 7x 1x1) en briques optimisées (ex: 1x4 + 1x3)."""
     if not run_bricks: return []
-    
-    ref_b = run_bricks[0]
-    
-    if orientation == "H":
-        # Somme des longueurs
-        total_len = sum(b.length for b in run_bricks)
-        width_ref = ref_b.width # Doit être à 1 normalement
-        
-        # Partitionnement optimal
-        segments = get_best_partition(total_len, width_ref)
-        
-        # Création des nouvelles briques
-        new_bricks = []
-        curr_x = ref_b.x
-        for seg_len in segments:
-            new_bricks.append(Brick(ref_b.layer, curr_x, ref_b.y, seg_len, width_ref, ref_b.color, "H"))
-            curr_x += seg_len
-            
-    else: # V
-        # Somme des largeurs 
-        total_len = sum(b.width for b in run_bricks)
-        width_ref = ref_b.length 
-        
-        segments = get_best_partition(total_len, width_ref)
-        
-        new_bricks = []
-        curr_y = ref_b.y
-        for seg_len in segments:
-            # En Vertical : length=largeur(X), width=longueur(Y)
-            new_bricks.append(Brick(ref_b.layer, ref_b.x, curr_y, width_ref, seg_len, ref_b.color, "V"))
-            curr_y += seg_len
-            
-    return new_bricks
+    return _PROCESS_RUN.get(orientation, _process_run_V)(run_bricks)
+
+def split_run(layer, x, y, total_len, width_ref, color, orientation):
+    """Découpe un run de longueur totale `total_len` partant de (x, y) en briques valides."""
+    return _SPLIT_RUN.get(orientation, _split_run_V)(layer, x, y, total_len, width_ref, color)
 
 def optimize_layer_2d_side(bricks, orientation):
-    """Passe 2 : Fusion latérale (Élargissement) pour créer du 2xN."""
-    if orientation == "H":
-        bricks.sort(key=lambda b: (b.x, b.y))
-    else: 
-        bricks.sort(key=lambda b: (b.y, b.x))
-    
-    merged_list = []
-    if not bricks: return []
-    
-    i = 0
-    while i < len(bricks):
-        current = bricks[i]
-        # Fusion si possible avec le voisin immédiat dans la liste triée
-        if i + 1 < len(bricks):
-            next_b = bricks[i+1]
-            merged = merge_bricks_side(current, next_b)
-            if merged:
-                merged_list.append(merged)
-                i += 2 # On a consommé 2 briques
-                continue
-        # Sinon on garde la brique telle quelle
-        merged_list.append(current)
-        i += 1
-    return merged_list
-
-
-def solve_greedy_stripe(bricks):
-    """Stratégie : Rayures + Partitionnement Intelligent + Fusion 2D."""
-    print(f"[Solver] Démarrage... ({len(bricks)} briques initiales)")
-    
-    layers = defaultdict(list)
-    for b in bricks:
-        layers[b.layer].append(b)
-    
-    final_bricks = []
-    
-    for layer_idx in sorted(layers.keys()):
-        layer_content = layers[layer_idx]
-        
-        if layer_idx % 2 == 0:
-            orient = "H"
-        else:
-            orient = "V"
+    """
+    Passe 2 : Fusion latérale (Élargissement) pour créer du 2xN.
+    Fusion vectorisée (side_merge_array) : aucune boucle Python par brique.
+    """
+    if not len(bricks): return []
+    return side_merge_array(as_brick_array(bricks), orientation).to_bricks()
 
-        # Passe 1 : Partitionnement Intelligent (1x1 -> 1xN optimal)
-        pass1_bricks = optimize_layer_smart(layer_content, orient)
-        
-        # Passe 2 : Élargissement (1xN -> 2xN)
-        pass2_bricks = optimize_layer_2d_side(pass1_bricks, orient)
-        
-        final_bricks.extend(pass2_bricks)
 
-    reduction = 100 * (1 - len(final_bricks) / len(bricks))
-    print(f"[Solver] Terminé. Briques : {len(bricks)} -> {len(final_bricks)} (Réduction : {reduction:.1f}%)")
+def _horizontal_mask(layer, orientation=None):
+    """Masque "orientation H" par brique : parité de la couche si orientation=None, sinon constant."""
+    if orientation is None:
+        return layer % 2 == 0
+    return np.full(len(layer), orientation == "H")
+
+
+def find_runs_array(ba, orientation=None):
+    """
+    Détection vectorisée des runs de toutes les couches d'un BrickArray.
+
+    Avec orientation=None, les couches paires sont parcourues en "H" (runs selon X), les impaires
+    en "V" (runs selon Y) ; sinon toutes les couches suivent l'orientation donnée ("H" ou "V").
+    Un seul np.lexsort (couche, transverse, principal) ordonne toutes les briques ; un run se termine
+    dès que la couche, la coordonnée transverse ou la couleur change, ou que la brique suivante ne
+    commence pas exactement au bout de la précédente.
+
+    Retourne les colonnes des runs, triés par couche :
+    (layer, x, y, total_len, width_ref, color), où (x, y), width_ref et color sont ceux de la première brique du run.
+    """
+    horizontal = _horizontal_mask(ba.layer, orientation)
+    main = np.where(horizontal, ba.x, ba.y)
+    cross = np.where(horizontal, ba.y, ba.x)
+    dim_main = np.where(horizontal, ba.length, ba.width)
+    dim_cross = np.where(horizontal, ba.width, ba.length)
+
+    order = np.lexsort((main, cross, ba.layer))
+    layer, main, cross = ba.layer[order], main[order], cross[order]
+    dim_main, color = dim_main[order], ba.color[order]
+
+    breaks = ~(
+        (layer[1:] == layer[:-1]) & (cross[1:] == cross[:-1]) & (color[1:] == color[:-1])
+        & (main[1:] == main[:-1] + dim_main[:-1])
+    )
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    first = order[starts]
+
+    return (ba.layer[first], ba.x[first], ba.y[first], np.add.reduceat(dim_main, starts),
+            dim_cross[first], ba.color[first])
+
+
+def split_runs_array(runs, orientation=None):
+    """
+    Découpe vectorisée des runs (sortie de find_runs_array) en briques valides, renvoyées en BrickArray.
+
+    Chaque couple (total_len, width_ref) distinct n'est partitionné qu'une fois (get_best_partition) ;
+    les segments de tous les runs sont ensuite produits par np.repeat et des décalages cumulés,
+    dans l'ordre des runs puis des segments (même ordre que split_run).
+    """
+    layer, x, y, total_len, width_ref, color = runs
+    horizontal = _horizontal_mask(layer, orientation)
+
+    # Partitions des couples (longueur, largeur) distincts, mises bout à bout
+    keys, inverse = np.unique(np.stack((total_len, width_ref), axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    parts = [get_best_partition(int(n), int(w)) for n, w in keys.tolist()]
+    part_count = np.array([len(p) for p in parts], dtype=np.int64)
+    part_first = np.concatenate(([0], np.cumsum(part_count)[:-1]))
+    seg_len_flat = np.fromiter((L for p in parts for L in p), dtype=np.int32, count=int(part_count.sum()))
+    seg_off_flat = seg_len_flat.cumsum(dtype=np.int32) - seg_len_flat
+    seg_off_flat -= np.repeat(seg_off_flat[part_first], part_count)  # Décalage depuis le début du run
+
+    # Un segment par partie de chaque run
+    run_parts = part_count[inverse]
+    run_idx = np.repeat(np.arange(len(layer)), run_parts)
+    run_first = np.concatenate(([0], np.cumsum(run_parts)[:-1]))
+    flat = np.repeat(part_first[inverse] - run_first, run_parts) + np.arange(len(run_idx))
+    seg_len, seg_off = seg_len_flat[flat], seg_off_flat[flat]
+
+    h = horizontal[run_idx]
+    w = width_ref[run_idx]
+    return BrickArray(
+        layer=layer[run_idx],
+        x=np.where(h, x[run_idx] + seg_off, x[run_idx]).astype(np.int32),
+        y=np.where(h, y[run_idx], y[run_idx] + seg_off).astype(np.int32),
+        length=np.where(h, seg_len, w).astype(np.int32),
+        width=np.where(h, w, seg_len).astype(np.int32),
+        color=color[run_idx],
+        orientation=(~h).astype(np.uint8)
+    )
+
+
+def side_merge_array(ba, orientation=None):
+    """
+    Passe 2 vectorisée (équivalent colonnes de optimize_layer_2d_side), toutes couches traitées ensemble.
+
+    Les briques sont triées par (couche, principal, transverse) en un seul np.lexsort ; deux voisines
+    dans cet ordre fusionnent si merge_bricks_side l'accepterait (même couche, couleur et orientation,
+    même position et même dimension selon l'axe principal, contact sur l'axe transverse, taille au catalogue).
+    Le parcours glouton (fusion de i et i+1, puis saut à i+2) fusionne, dans chaque suite de paires
+    fusionnables consécutives, les paires de rang pair depuis le début de la suite.
+    """
+    n = len(ba)
+    if n == 0:
+        return ba
+
+    # Ordre de parcours (orientation demandée) ; règles de fusion selon l'orientation propre de chaque brique.
+    # Avec une orientation fixe, l'ordre ignore la couche comme optimize_layer_2d_side (une couche par appel).
+    horizontal = _horizontal_mask(ba.layer, orientation)
+    keys = (np.where(horizontal, ba.y, ba.x), np.where(horizontal, ba.x, ba.y))
+    order = np.lexsort(keys + (ba.layer,) if orientation is None else keys)
+    sb = BrickArray(*(col[order] for col in (ba.layer, ba.x, ba.y, ba.length, ba.width, ba.color, ba.orientation)))
+    layer, x, y, length, width, color, ori = sb.layer, sb.x, sb.y, sb.length, sb.width, sb.color, sb.orientation
+
+    own_h = ori == 0
+    cross = np.where(own_h, y, x)
+    dim_cross = np.where(own_h, width, length)
+
+    # Paires (i, i+1) de l'ordre de parcours : règles de merge_bricks_side, taille finale comprise
+    a, b = slice(None, -1), slice(1, None)
+    new_cross = dim_cross[a] + dim_cross[b]
+    can = (
+        merge.can_merge_side_pairs(sb, a, b)
+        & merge.valid_parts_mask(np.where(own_h[a], length[a], new_cross), np.where(own_h[a], new_cross, width[a]))
+    )
+
+    # Fusion aux paires de rang pair dans chaque suite de paires fusionnables
+    idx = np.arange(n - 1)
+    run_start = np.maximum.accumulate(np.where(can & ~np.concatenate(([False], can[:-1])), idx, 0))
+    merged_at = np.concatenate((can & ((idx - run_start) % 2 == 0), [False]))
+    consumed = np.concatenate(([False], merged_at[:-1]))
+
+    nxt = np.minimum(np.arange(n) + 1, n - 1)
+    widened = np.where(merged_at, dim_cross + dim_cross[nxt], dim_cross)
+    start_cross = np.where(merged_at, np.minimum(cross, cross[nxt]), cross)
+
+    keep = ~consumed
+    own_h = own_h[keep]
+    return BrickArray(
+        layer=layer[keep],
+        x=np.where(own_h, x[keep], start_cross[keep]).astype(np.int32),
+        y=np.where(own_h, start_cross[keep], y[keep]).astype(np.int32),
+        length=np.where(own_h, length[keep], widened[keep]).astype(np.int32),
+        width=np.where(own_h, widened[keep], width[keep]).astype(np.int32),
+        color=color[keep],
+        orientation=ori[keep]
+    )
+
+
+def solve_greedy_stripe(bricks, as_array=False):
+    """
+    Stratégie : Rayures + Partitionnement Intelligent + Fusion 2D.
+    Accepte une liste de Brick ou un BrickArray (converti une seule fois).
+    Les deux passes travaillent sur les colonnes de toutes les couches à la fois ; les Brick ne sont créées qu'à la fin.
+    Avec as_array=True, le résultat reste un BrickArray (aucun objet Brick : environ 25 octets par brique).
+    """
+    ba = as_brick_array(bricks)
+    runs = find_runs_array(ba) if len(ba) else None
+    return solve_greedy_stripe_runs(runs, len(ba), as_array=as_array)
+
+
+def solve_greedy_stripe_runs(runs, n_initial=None, as_array=False):
+    """
+    solve_greedy_stripe à partir des runs de la passe 1 déjà détectés (find_runs_array,
+    ou brique_merge.runs_from_numpy directement sur la grille de voxels).
+    `n_initial` (nombre de briques avant fusion, pour le bilan) vaut par défaut la surface des runs.
+    """
+    if n_initial is None:
+        n_initial = int(np.dot(runs[3].astype(np.int64), runs[4]))
+    print(f"[Solver] Démarrage... ({n_initial} briques initiales)")
+    if n_initial == 0:
+        return BrickArray.from_bricks([]) if as_array else []
+
+    # Passe 1 : Partitionnement Intelligent (1x1 -> 1xN optimal)
+    pass1 = split_runs_array(runs)
+
+    # Passe 2 : Élargissement (1xN -> 2xN)
+    # Les couches sont indépendantes : un seul tri et des opérations colonnes les traitent toutes ensemble
+    final_bricks = side_merge_array(pass1)
+
+    reduction = 100 * (1 - len(final_bricks) / n_initial)
+    print(f"[Solver] Terminé. Briques : {n_initial} -> {len(final_bricks)} (Réduction : {reduction:.1f}%)")
     
-    return final_bricks
+    return final_bricks if as_array else final_bricks.to_bricks()
 
 
 if __name__ == "__main__":